@@ -0,0 +1,102 @@
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from inventory import InsufficientStock, InventorySnapshot
+
+# How a sale picks the warehouses it is taken from:
+#   home_first    - the home warehouse if it covers the line, otherwise the
+#                   warehouse with the most stock that does
+#   largest_stock - the warehouse with the most stock that covers the line
+#   split         - the home warehouse first, then the largest ones, taking
+#                   what each has until the line is covered
+DEFAULT_POLICY = os.environ.get('NOOR_ALLOCATION_POLICY', 'home_first')
+_home = os.environ.get('NOOR_HOME_WAREHOUSE')
+DEFAULT_HOME_WAREHOUSE: Optional[int] = int(_home) if _home else None
+
+Allocation = List[Tuple[int, int]]
+
+
+def _preference(available: Dict[int, int], home: Optional[int]) -> List[int]:
+    """Warehouses with stock: home first, then by stock descending, ties by id"""
+    return sorted((warehouse_id for warehouse_id, quantity in available.items() if quantity > 0),
+                  key=lambda warehouse_id: (warehouse_id != home,
+                                            -available[warehouse_id], warehouse_id))
+
+
+def _single(order: List[int], available: Dict[int, int], quantity: int) -> Allocation:
+    for warehouse_id in order:
+        if available[warehouse_id] >= quantity:
+            return [(warehouse_id, quantity)]
+    return []
+
+
+def _home_first(available, quantity, home) -> Allocation:
+    return _single(_preference(available, home), available, quantity)
+
+
+def _largest_stock(available, quantity, home) -> Allocation:
+    return _single(_preference(available, None), available, quantity)
+
+
+def _split(available, quantity, home) -> Allocation:
+    allocation, remaining = [], quantity
+    for warehouse_id in _preference(available, home):
+        take = min(available[warehouse_id], remaining)
+        allocation.append((warehouse_id, take))
+        remaining -= take
+        if not remaining:
+            return allocation
+    return []
+
+
+_POLICIES: Dict[str, Callable[[Dict[int, int], int, Optional[int]], Allocation]] = {
+    'home_first': _home_first,
+    'largest_stock': _largest_stock,
+    'split': _split,
+}
+
+
+class Allocator:
+    """Picks the source warehouses of each sale line from the inventory snapshot"""
+
+    def __init__(self, inventory: InventorySnapshot, policy: Optional[str] = None,
+                 home_warehouse_id: Optional[int] = DEFAULT_HOME_WAREHOUSE):
+        name = policy or DEFAULT_POLICY
+        if name not in _POLICIES:
+            raise ValueError(f"Unknown allocation policy: {name}")
+        self.inventory = inventory
+        self.policy = name
+        self.home_warehouse_id = home_warehouse_id
+        self._allocate = _POLICIES[name]
+
+    def allocate(self, product_id: int, quantity: int) -> Allocation:
+        """[(warehouse_id, quantity)] covering quantity of the product from unreserved stock.
+
+        Raises InsufficientStock (warehouse_id None) when the policy cannot
+        cover the quantity; available is what the policy could have taken.
+        """
+        available = self.inventory.available_by_warehouse(product_id)
+        allocation = []
+        if quantity > 0:
+            allocation = self._allocate(available, quantity, self.home_warehouse_id)
+        if not allocation:
+            raise InsufficientStock(product_id, None, self.available(product_id, available))
+        return allocation
+
+    def available(self, product_id: int, available: Optional[Dict[int, int]] = None) -> int:
+        """Largest quantity of the product one line can be allocated under this policy"""
+        if available is None:
+            available = self.inventory.available_by_warehouse(product_id)
+        quantities = [quantity for quantity in available.values() if quantity > 0]
+        if self.policy == 'split':
+            return sum(quantities)
+        return max(quantities, default=0)
+
+
+def warehouse_decrements(lines: Iterable) -> Dict[Tuple[Optional[int], int], int]:
+    """Allocated sale lines folded into one (warehouse_id, product_id) -> quantity batch"""
+    decrements: Dict[Tuple[Optional[int], int], int] = {}
+    for line in lines:
+        key = (line.warehouse_id, line.product_id)
+        decrements[key] = decrements.get(key, 0) + line.quantity
+    return decrements
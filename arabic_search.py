@@ -0,0 +1,38 @@
+import sqlite3
+from typing import Optional
+
+# Spelling variants that should match each other when searching
+_LETTER_VARIANTS = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ة': 'ه',
+    'ؤ': 'و',
+}
+# Harakat, Quranic marks and tatweel are dropped entirely
+_DROPPED = [chr(c) for c in range(0x0610, 0x061B)] + \
+           [chr(c) for c in range(0x064B, 0x0660)] + \
+           [chr(0x0670), chr(0x0640)] + \
+           [chr(c) for c in range(0x06D6, 0x06EE)]
+_ARABIC_DIGITS = {chr(0x0660 + i): str(i) for i in range(10)}
+_ARABIC_DIGITS.update({chr(0x06F0 + i): str(i) for i in range(10)})
+
+_NORMALIZE_TABLE = str.maketrans({**_LETTER_VARIANTS, **_ARABIC_DIGITS,
+                                  **{c: None for c in _DROPPED}})
+
+
+def normalize_arabic(text: Optional[str]) -> str:
+    """Fold Arabic spelling variants, diacritics and digits for matching"""
+    if not text:
+        return ''
+    return str(text).translate(_NORMALIZE_TABLE).lower()
+
+
+def fts_match_expression(query: str) -> str:
+    """FTS5 MATCH string requiring every term of query as a prefix"""
+    terms = normalize_arabic(query).split()
+    return ' '.join('"' + term.replace('"', '') + '"*' for term in terms if term.replace('"', ''))
+
+
+def register_functions(conn: sqlite3.Connection):
+    """SQL functions the search triggers rely on; needed on every connection"""
+    conn.create_function('arabic_normalize', 1, normalize_arabic, deterministic=True)
@@ -0,0 +1,184 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from inventory import InventorySnapshot
+
+
+class CartLine(NamedTuple):
+    product_id: int
+    product_name: str
+    warehouse_id: Optional[int]
+    quantity: int
+    unit_price: float
+    price_type: str
+    # Lowest supply price known when the line was added; 0 if none
+    unit_cost: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.unit_price * self.quantity
+
+    @property
+    def cost(self) -> float:
+        return self.unit_cost * self.quantity
+
+    @property
+    def key(self) -> Tuple[int, Optional[int], str, float]:
+        # Lines merge only when they would print identically on the invoice
+        return (self.product_id, self.warehouse_id, self.price_type, self.unit_price)
+
+
+class Cart:
+    """Lines of the order being rung up, with running totals.
+
+    Subtotal, cost and the reserved quantity per product/warehouse are
+    adjusted by each line change instead of being summed again, so reading
+    any total is O(1).
+
+    With an inventory, every quantity the cart gains is reserved in its
+    ledger first (raising InsufficientStock, with the cart unchanged, if it
+    is not available) and every quantity it loses is released.
+    """
+
+    def __init__(self, vat_rate: float = 0.0, inventory: Optional[InventorySnapshot] = None):
+        self.inventory = inventory
+        # False once commit_reservations() handed the reservations to a sale
+        self._holding = True
+        self._lines: List[CartLine] = []
+        self._rows: Dict[Tuple[int, Optional[int], str, float], int] = {}
+        self._reserved: Dict[Tuple[int, Optional[int]], int] = {}
+        self.subtotal = 0.0
+        self.cost = 0.0
+        self.discount = 0.0
+        self.vat_enabled = False
+        self.vat_rate = vat_rate
+
+    @property
+    def lines(self) -> List[CartLine]:
+        return self._lines
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines)
+
+    def __getitem__(self, row: int) -> CartLine:
+        return self._lines[row]
+
+    @property
+    def net(self) -> float:
+        return self.subtotal - self.discount
+
+    @property
+    def vat(self) -> float:
+        return self.net * self.vat_rate if self.vat_enabled else 0.0
+
+    @property
+    def total(self) -> float:
+        return self.net + self.vat
+
+    @property
+    def profit(self) -> float:
+        return self.net - self.cost
+
+    def find(self, product_id: int, warehouse_id: Optional[int], price_type: str,
+             unit_price: float) -> Optional[int]:
+        """Row of the line for this product, warehouse and price, if any"""
+        return self._rows.get((product_id, warehouse_id, price_type, unit_price))
+
+    def reserved(self, product_id: int, warehouse_id: Optional[int]) -> int:
+        """Quantity of a product already taken from a warehouse, over all price types"""
+        return self._reserved.get((product_id, warehouse_id), 0)
+
+    def reserve(self, line: CartLine):
+        """Reserve line's quantity in the inventory ledger; raises InsufficientStock"""
+        self._reserve(line.product_id, line.warehouse_id, line.quantity)
+
+    def add(self, line: CartLine, reserved: bool = False) -> int:
+        """Append line, or merge it into the existing line with the same key; returns its row.
+
+        reserved means the caller already called reserve(line).
+        """
+        if not reserved:
+            self.reserve(line)
+        row = self._rows.get(line.key)
+        if row is not None:
+            self._replace(row, self._lines[row].quantity + line.quantity)
+            return row
+        row = len(self._lines)
+        self._lines.append(line)
+        self._rows[line.key] = row
+        self._apply(line, 1)
+        return row
+
+    def set_quantity(self, row: int, quantity: int):
+        old = self._lines[row]
+        change = quantity - old.quantity
+        if change > 0:
+            self._reserve(old.product_id, old.warehouse_id, change)
+        elif change < 0:
+            self._release(old.product_id, old.warehouse_id, -change)
+        self._replace(row, quantity)
+
+    def remove(self, row: int) -> CartLine:
+        line = self._lines.pop(row)
+        self._release(line.product_id, line.warehouse_id, line.quantity)
+        self._apply(line, -1)
+        del self._rows[line.key]
+        for later in self._lines[row:]:
+            self._rows[later.key] -= 1
+        if not self._lines:
+            # Drop the rounding residue of the running sums
+            self.subtotal = self.cost = 0.0
+        return line
+
+    def commit_reservations(self):
+        """Hand everything the cart reserved over to a sale; clear() the cart afterwards"""
+        if self.inventory is not None and self._holding:
+            self.inventory.commit_reserved(
+                (product_id, warehouse_id, quantity)
+                for (product_id, warehouse_id), quantity in self._reserved.items())
+        self._holding = False
+
+    def clear(self):
+        for (product_id, warehouse_id), quantity in self._reserved.items():
+            self._release(product_id, warehouse_id, quantity)
+        self._holding = True
+        self._lines = []
+        self._rows = {}
+        self._reserved = {}
+        self.subtotal = self.cost = 0.0
+        self.discount = 0.0
+
+    def set_discount(self, amount: float):
+        self.discount = amount
+
+    def set_vat(self, enabled: bool, rate: float):
+        """rate is a fraction, e.g. 0.14"""
+        self.vat_enabled = enabled
+        self.vat_rate = rate
+
+    def _replace(self, row: int, quantity: int):
+        old = self._lines[row]
+        new = old._replace(quantity=quantity)
+        self._apply(old, -1)
+        self._lines[row] = new
+        self._apply(new, 1)
+
+    def _reserve(self, product_id: int, warehouse_id: Optional[int], quantity: int):
+        if self.inventory is not None and self._holding:
+            self.inventory.reserve(product_id, warehouse_id, quantity)
+
+    def _release(self, product_id: int, warehouse_id: Optional[int], quantity: int):
+        if self.inventory is not None and self._holding:
+            self.inventory.release(product_id, warehouse_id, quantity)
+
+    def _apply(self, line: CartLine, sign: int):
+        self.subtotal += sign * line.total
+        self.cost += sign * line.cost
+        key = (line.product_id, line.warehouse_id)
+        reserved = self._reserved.get(key, 0) + sign * line.quantity
+        if reserved:
+            self._reserved[key] = reserved
+        else:
+            self._reserved.pop(key, None)
@@ -0,0 +1,285 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from cart import Cart, CartLine
+
+# Attempts for a checkout whose commit keeps hitting a locked database
+MAX_ATTEMPTS = 5
+RETRY_DELAY_S = 0.2
+
+
+def journal_path(db_path: str) -> str:
+    return os.path.splitext(db_path)[0] + '_checkout_journal.db'
+
+
+class CheckoutJournal:
+    """Small append-only SQLite file holding finished carts until they commit.
+
+    It lives beside the main database but is a separate file, so appending a
+    checkout never waits on the main database's write lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A checkout acknowledged to the cashier must survive a power cut
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_checkouts (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                checkout_id TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self._conn.commit()
+
+    def append(self, checkout_id: str, payload: dict) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO pending_checkouts (checkout_id, payload) VALUES (?, ?)",
+                (checkout_id, json.dumps(payload)))
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def pending(self) -> List[Tuple[int, dict]]:
+        """Uncommitted checkouts, oldest first"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT seq, payload FROM pending_checkouts
+                WHERE status = 'pending' ORDER BY seq
+            """).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    def failed_checkouts(self) -> List[Tuple[int, dict, str]]:
+        """(seq, payload, last_error) of checkouts that gave up, oldest first"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT seq, payload, last_error FROM pending_checkouts
+                WHERE status = 'failed' ORDER BY seq
+            """).fetchall()
+        return [(seq, json.loads(payload), error or '') for seq, payload, error in rows]
+
+    def mark_pending(self, seq: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pending_checkouts SET status = 'pending' WHERE seq = ?", (seq,))
+            self._conn.commit()
+
+    def count_pending(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM pending_checkouts WHERE status = 'pending'").fetchone()[0]
+
+    def done(self, seq: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM pending_checkouts WHERE seq = ?", (seq,))
+            self._conn.commit()
+
+    def failed(self, seq: int, error: str, attempts: int):
+        """Keep the checkout for manual review instead of retrying it forever"""
+        with self._lock:
+            self._conn.execute("""
+                UPDATE pending_checkouts SET status = 'failed', last_error = ?, attempts = ?
+                WHERE seq = ?
+            """, (error, attempts, seq))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CheckoutQueue(QObject):
+    """Commits journaled checkouts to the database in order on one worker thread.
+
+    submit() only appends to the journal and updates the in-memory stock, so
+    the sales screen can start the next sale at once. Checkouts left in the
+    journal by a previous run are queued ahead of new ones by start(); commit_order's
+    checkout_id makes a replay of an already committed checkout a no-op.
+    """
+
+    # Emitted from the worker thread; queued onto the receivers' thread
+    committed = pyqtSignal(str, int)   # checkout_id, order_id
+    failed = pyqtSignal(str, str)      # checkout_id, error
+    pending_changed = pyqtSignal(int)
+
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.inventory = db_manager.inventory
+        self.journal = CheckoutJournal(journal_path(db_manager.db_path))
+        # (seq, payload, reserved): reserved when submit() already took the stock
+        self._queue: "queue.Queue[Optional[Tuple[int, dict, bool]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # Checkouts queued so far; a reader compares it before and after a
+        # database read to know whether a queued sale may be missing from it
+        self.queued = 0
+
+    def start(self):
+        """Start the worker with the checkouts left over from the last run queued first.
+
+        Checkouts that failed in an earlier run are reported through failed
+        so they can be retried or discarded.
+        """
+        if self._thread is not None:
+            return
+        for seq, payload in self.journal.pending():
+            self._queue.put((seq, payload, False))
+            self.queued += 1
+        self._thread = threading.Thread(target=self._run, name='checkout-worker',
+                                        daemon=True)
+        self._thread.start()
+        for seq, payload, error in self.journal.failed_checkouts():
+            self.failed.emit(payload['checkout_id'], error)
+
+    def failed_checkouts(self) -> List[Tuple[str, str]]:
+        """(checkout_id, error) of checkouts kept for review"""
+        return [(payload['checkout_id'], error)
+                for _, payload, error in self.journal.failed_checkouts()]
+
+    def retry(self, checkout_id: str) -> bool:
+        """Queue a failed checkout for another commit"""
+        for seq, payload, _ in self.journal.failed_checkouts():
+            if payload['checkout_id'] == checkout_id:
+                self.journal.mark_pending(seq)
+                self._queue.put((seq, payload, False))
+                self.queued += 1
+                self.pending_changed.emit(self.pending_count())
+                return True
+        return False
+
+    def discard(self, checkout_id: str) -> bool:
+        """Drop a failed checkout; its stock was already given back when it failed"""
+        for seq, payload, _ in self.journal.failed_checkouts():
+            if payload['checkout_id'] == checkout_id:
+                self.journal.done(seq)
+                return True
+        return False
+
+    def submit(self, customer_id: Optional[int], cart: Cart) -> str:
+        """Journal the finished cart and queue it for commit; returns its checkout_id.
+
+        cart must reserve from this queue's inventory; clear it afterwards.
+        """
+        checkout_id = uuid.uuid4().hex
+        payload = {
+            'checkout_id': checkout_id,
+            'customer_id': customer_id,
+            'subtotal': cart.subtotal,
+            'net_total': cart.net,
+            'vat': cart.vat,
+            'vat_percent': round(cart.vat_rate * 100, 4) if cart.vat_enabled else 0.0,
+            'issued_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'lines': [list(line) for line in cart],
+        }
+        seq = self.journal.append(checkout_id, payload)
+        # The cart's reservations become the sale, so the stock shown for the
+        # next sale already excludes this one
+        cart.commit_reservations()
+        self._queue.put((seq, payload, True))
+        self.queued += 1
+        self.pending_changed.emit(self.pending_count())
+        return checkout_id
+
+    def pending_count(self) -> int:
+        return self.journal.count_pending()
+
+    def shutdown(self):
+        """Commit everything queued so far, then stop the worker"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self.journal.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            seq, payload, reserved = item
+            if reserved:
+                # Stock was already taken from the snapshot by submit()
+                self._process(seq, payload, update_inventory=False, reserved=True)
+            else:
+                # Leftovers and retries were never applied to this process's
+                # snapshot; if it is already loaded it must be updated too
+                self._process(seq, payload, update_inventory=self.inventory.loaded)
+
+    def _process(self, seq: int, payload: dict, update_inventory: bool,
+                 reserved: bool = False):
+        """Commit one checkout; reserved means submit() already took its stock"""
+        checkout_id = payload['checkout_id']
+        lines = [CartLine(*line) for line in payload['lines']]
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                order_id = self.db_manager.commit_order(
+                    payload['customer_id'], lines, payload['subtotal'], payload['net_total'],
+                    checkout_id=checkout_id, update_inventory=update_inventory,
+                    # Journals written before these were recorded lack them
+                    issued_at=payload.get('issued_at'), vat=payload.get('vat', 0.0),
+                    vat_percent=payload.get('vat_percent', 0.0))
+                break
+            except sqlite3.OperationalError as e:
+                # Another writer holds the database; back off and try again
+                message = str(e)
+                if attempts < MAX_ATTEMPTS and ('locked' in message or 'busy' in message):
+                    time.sleep(RETRY_DELAY_S * attempts)
+                    continue
+                self._fail(seq, payload, message, attempts, reserved)
+                return
+            except Exception as e:
+                self._fail(seq, payload, str(e), attempts, reserved)
+                return
+        self.journal.done(seq)
+        self.committed.emit(checkout_id, order_id)
+        self.pending_changed.emit(self.pending_count())
+
+    def _fail(self, seq: int, payload: dict, error: str, attempts: int, reserved: bool):
+        self.journal.failed(seq, error, attempts)
+        if reserved:
+            # Give back the stock submit() took for the sale that never happened
+            self.inventory.apply_sale((product_id, warehouse_id, -quantity)
+                                      for product_id, warehouse_id, quantity
+                                      in _sale_lines(payload))
+        self.failed.emit(payload['checkout_id'], error)
+        self.pending_changed.emit(self.pending_count())
+
+
+def _sale_lines(payload: dict):
+    return [(line.product_id, line.warehouse_id, line.quantity)
+            for line in (CartLine(*values) for values in payload['lines'])]
+
+
+_queues: Dict[str, CheckoutQueue] = {}
+
+
+def get_checkout_queue(db_manager) -> CheckoutQueue:
+    """Shared queue for db_manager's database; must first be called from the GUI thread"""
+    checkout_queue = _queues.get(db_manager.db_path)
+    if checkout_queue is None:
+        checkout_queue = _queues[db_manager.db_path] = CheckoutQueue(db_manager)
+    return checkout_queue
+
+
+def shutdown_checkout_queues():
+    for checkout_queue in _queues.values():
+        checkout_queue.shutdown()
+    _queues.clear()
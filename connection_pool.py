@@ -0,0 +1,181 @@
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from arabic_search import register_functions
+from db_profiles import apply_profile, resolve_profile
+from query_instrumentation import InstrumentedConnection
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 10.0
+
+
+class ConnectionPool:
+    """Pool of long-lived SQLite connections, one checked out per thread"""
+
+    def __init__(self, db_path: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT, profile: Optional[str] = None):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.profile = profile
+        self._local = threading.local()
+        self._idle: List[sqlite3.Connection] = []
+        self._open: List[sqlite3.Connection] = []
+        self._available = threading.Condition()
+        self._closed = False
+        # Bumped by health_check(); a thread re-checks its own connection when behind
+        self._generation = 0
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, checking one out if needed"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            if self._local.generation == self._generation:
+                return conn
+            # A health check ran since this thread last looked at its connection
+            self._local.generation = self._generation
+            if self._is_healthy(conn):
+                return conn
+            self._local.conn = None
+            with self._available:
+                self._discard(conn)
+                self._available.notify()
+        conn = self._checkout()
+        self._local.conn = conn
+        self._local.generation = self._generation
+        return conn
+
+    def release(self):
+        """Hand the calling thread's connection back to the pool"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self._available:
+            if self._closed:
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._available.notify()
+
+    def health_check(self) -> bool:
+        """Ping the idle connections and the caller's, replacing any that no longer respond.
+
+        Connections held by other threads are in use there and are not touched
+        from here; each such thread pings its own on its next get_connection().
+        """
+        with self._available:
+            if self._closed:
+                return False
+            self._generation += 1
+            healthy = []
+            for conn in self._idle:
+                if self._is_healthy(conn):
+                    healthy.append(conn)
+                else:
+                    self._discard(conn)
+            self._idle = healthy
+            self._available.notify_all()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.generation = self._generation
+        if conn is not None and not self._is_healthy(conn):
+            self._local.conn = None
+            with self._available:
+                self._discard(conn)
+                self._available.notify()
+            return False
+        return True
+
+    def close_all(self):
+        """Close every connection and refuse further checkouts"""
+        with self._available:
+            self._closed = True
+            for conn in self._open:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._open = []
+            self._idle = []
+            self._available.notify_all()
+        self._local = threading.local()
+
+    @property
+    def size(self) -> int:
+        return len(self._open)
+
+    def _checkout(self) -> sqlite3.Connection:
+        with self._available:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._is_healthy(conn):
+                        return conn
+                    self._discard(conn)
+                if len(self._open) < self.pool_size:
+                    conn = self._create_connection()
+                    self._open.append(conn)
+                    return conn
+                if not self._available.wait(self.timeout):
+                    raise sqlite3.OperationalError(
+                        f"No free database connection after {self.timeout} seconds")
+
+    def _create_connection(self) -> sqlite3.Connection:
+        # Connections may be released by one thread and checked out by another
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               check_same_thread=False,
+                               factory=InstrumentedConnection)
+        apply_profile(conn, self.profile)
+        register_functions(conn)
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        if conn in self._open:
+            self._open.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+
+# Keyed by (db_path, profile): connections of different profiles are never shared
+_pools: Dict[Tuple[str, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, pool_size: Optional[int] = None,
+             profile: Optional[str] = None) -> ConnectionPool:
+    """Return the shared pool for db_path and profile, creating it on first use"""
+    key = (db_path, resolve_profile(profile))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path, pool_size or DEFAULT_POOL_SIZE,
+                                  profile=key[1])
+            _pools[key] = pool
+        elif pool_size is not None and pool_size != pool.pool_size:
+            raise ValueError(f"Pool for {db_path} ({key[1]}) already holds "
+                             f"{pool.pool_size} connections, not {pool_size}")
+        return pool
+
+
+def close_all_pools():
+    """Close every shared pool; a later get_pool() starts a fresh one"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
@@ -1,12 +1,18 @@
 import sqlite3
 from sqlite3 import Error
 import os
+from db_profiles import apply_profile
+from arabic_search import register_functions
+from migrations import migrate
+from query_instrumentation import InstrumentedConnection
 
-def create_connection():
+def create_connection(profile=None):
     """Create a database connection to SQLite database"""
     conn = None
     try:
-        conn = sqlite3.connect('noor_alislam.db')
+        conn = sqlite3.connect('noor_alislam.db', factory=InstrumentedConnection)
+        apply_profile(conn, profile)
+        register_functions(conn)
         return conn
     except Error as e:
         print(e)
@@ -202,10 +208,15 @@ def create_tables(conn):
         print(f"Error creating tables: {e}")
 
 def initialize_database():
-    """Initialize the database and create all tables"""
-    conn = create_connection()
+    """Initialize the database, create all tables and apply pending migrations"""
+    # Migrations backfill whole tables; an interrupted one is rerun on next start
+    conn = create_connection('bulk_import')
     if conn is not None:
         create_tables(conn)
+        try:
+            migrate(conn)
+        except Error as e:
+            print(f"Error migrating database: {e}")
         conn.close()
     else:
         print("Error! Cannot create the database connection.")
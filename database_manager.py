@@ -1,17 +1,58 @@
 import sqlite3
-from typing import List, Tuple, Optional, Dict
+from typing import Iterable, List, Tuple, Optional, Dict
 import datetime
+import json
+from connection_pool import get_pool
+from arabic_search import fts_match_expression
+from inventory import InsufficientStock, get_snapshot
+from allocation import warehouse_decrements
+from records import ProductRow, CustomerRow, SupplierRow, Page, record_factory
+
+# Page totals are counted up to this many rows so page 1 stays cheap
+COUNT_ESTIMATE_CAP = 10000
+# catalog_changes rows kept for readers that are behind; older ones are pruned
+CATALOG_CHANGES_KEEP = 10000
+
+# Keyset sort orders; every one of them is backed by an index
+# Qualified so ORDER BY and the seek use the stored warehouse_id (0 for none)
+# and its index, not the NULLIF(...) alias the page selects; the cursor maps
+# None back to 0 in Python
+PRODUCT_SORT_KEYS = {
+    'name': (('product_catalog.product_name', 'product_catalog.product_id',
+              'product_catalog.warehouse_id'),
+             lambda r: (r.product_name, r.product_id, r.warehouse_id or 0)),
+    'id': (('product_catalog.product_id', 'product_catalog.warehouse_id'),
+           lambda r: (r.product_id, r.warehouse_id or 0)),
+}
+CUSTOMER_SORT_KEYS = {
+    'name': (('customer_name', 'customer_id'), lambda r: (r.customer_name, r.customer_id)),
+    'id': (('customer_id',), lambda r: (r.customer_id,)),
+}
+SUPPLIER_SORT_KEYS = {
+    'name': (('s.supplier_name', 's.supplier_id'), lambda r: (r.supplier_name, r.supplier_id)),
+    'id': (('s.supplier_id',), lambda r: (r.supplier_id,)),
+}
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "noor_alislam.db"):
+    def __init__(self, db_path: str = "noor_alislam.db", pool_size: Optional[int] = None,
+                 profile: Optional[str] = None):
         self.db_path = db_path
+        self.pool = get_pool(db_path, pool_size, profile)
+        self.inventory = get_snapshot(db_path)
 
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        # Pooled connections are long-lived; callers must not close them
+        return self.pool.get_connection()
 
-    def get_suppliers(self) -> List[Tuple]:
+    def release_connection(self):
+        """Return the calling thread's connection to the pool"""
+        self.pool.release()
+
+    def get_suppliers(self, as_records: bool = False) -> List[Tuple]:
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            if as_records:
+                cursor.row_factory = record_factory(SupplierRow)
             cursor.execute("""
                 SELECT s.supplier_id, s.supplier_name, s.contact_details,
                        GROUP_CONCAT(p.product_name, ', ') as products,
@@ -24,6 +65,24 @@ class DatabaseManager:
             """)
             return cursor.fetchall()
 
+    def get_suppliers_page(self, filter_text: str = "", sort_key: str = 'name',
+                           after: Optional[tuple] = None, limit: int = 100) -> Page:
+        filters, params = [], []
+        if filter_text:
+            filters.append("instr(s.supplier_name, ?) > 0")
+            params.append(filter_text)
+        # Aggregates are computed for the rows of this page only
+        return self._fetch_page(SupplierRow, """
+            SELECT s.supplier_id, s.supplier_name, s.contact_details,
+                   (SELECT GROUP_CONCAT(p.product_name, ', ')
+                    FROM supplier_products sp
+                    JOIN products p ON sp.product_id = p.product_id
+                    WHERE sp.supplier_id = s.supplier_id) as products,
+                   (SELECT COUNT(DISTINCT sp.product_id)
+                    FROM supplier_products sp
+                    WHERE sp.supplier_id = s.supplier_id) as product_count
+        """, "FROM suppliers s", filters, params, SUPPLIER_SORT_KEYS[sort_key], after, limit)
+
     def get_products(self) -> List[Tuple]:
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -111,43 +170,99 @@ class DatabaseManager:
             conn.commit()
             return cursor.rowcount > 0
 
-    def get_products_with_details(self) -> List[Tuple]:
+    def get_products_with_details(self, as_records: bool = False) -> List[Tuple]:
+        # product_catalog is kept current by triggers, see migrations.py
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            if as_records:
+                cursor.row_factory = record_factory(ProductRow)
             cursor.execute("""
                 SELECT 
-                    p.product_id,
-                    p.product_name,
-                    p.description,
-                    p.unit_type,
-                    p.min_stock_level,
-                    COALESCE(wp.quantity, 0) as current_stock,
-                    w.warehouse_name,
-                    MIN(sp.supply_price) as min_supply_price,
-                    GROUP_CONCAT(DISTINCT s.supplier_name) as suppliers,
-                    (
-                        SELECT MIN(od1.sale_price)
-                        FROM order_details od1
-                        WHERE od1.product_id = p.product_id
-                        AND od1.price_type = 'wholesale'
-                    ) as wholesale_price,
-                    (
-                        SELECT MIN(od2.sale_price)
-                        FROM order_details od2
-                        WHERE od2.product_id = p.product_id
-                        AND od2.price_type = 'retail'
-                    ) as retail_price,
-                    w.warehouse_id
-                FROM products p
-                LEFT JOIN warehouse_products wp ON p.product_id = wp.product_id
-                LEFT JOIN warehouses w ON wp.warehouse_id = w.warehouse_id
-                LEFT JOIN supplier_products sp ON p.product_id = sp.product_id
-                LEFT JOIN suppliers s ON sp.supplier_id = s.supplier_id
-                GROUP BY p.product_id, w.warehouse_id
-                ORDER BY p.product_name
+                    product_id,
+                    product_name,
+                    description,
+                    unit_type,
+                    min_stock_level,
+                    current_stock,
+                    warehouse_name,
+                    min_supply_price,
+                    suppliers,
+                    wholesale_price,
+                    retail_price,
+                    NULLIF(warehouse_id, 0) as warehouse_id
+                FROM product_catalog
+                ORDER BY product_name, product_id, product_catalog.warehouse_id
             """)
             return cursor.fetchall()
 
+    def get_products_page(self, filter_text: str = "", sort_key: str = 'name',
+                          after: Optional[tuple] = None, limit: int = 100) -> Page:
+        filters, params = [], []
+        match = fts_match_expression(filter_text)
+        if match:
+            filters.append("product_id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)")
+            params.append(match)
+        return self._fetch_page(ProductRow, """
+            SELECT product_id, product_name, description, unit_type,
+                   min_stock_level, current_stock, warehouse_name,
+                   min_supply_price, suppliers, wholesale_price, retail_price,
+                   NULLIF(warehouse_id, 0) as warehouse_id
+        """, "FROM product_catalog", filters, params, PRODUCT_SORT_KEYS[sort_key], after, limit)
+
+    def search_products(self, query: str, limit: int = 50) -> List[ProductRow]:
+        """Ranked prefix search over product names, descriptions and codes"""
+        match = fts_match_expression(query)
+        if not match:
+            return []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = record_factory(ProductRow)
+            cursor.execute("""
+                SELECT c.product_id, c.product_name, c.description, c.unit_type,
+                       c.min_stock_level, c.current_stock, c.warehouse_name,
+                       c.min_supply_price, c.suppliers, c.wholesale_price, c.retail_price,
+                       NULLIF(c.warehouse_id, 0) as warehouse_id
+                FROM products_fts f
+                JOIN product_catalog c ON c.product_id = f.rowid
+                WHERE products_fts MATCH ?
+                ORDER BY f.rank, c.product_name, c.warehouse_id
+                LIMIT ?
+            """, (match, limit))
+            return cursor.fetchall()
+
+    def _fetch_page(self, record_cls, select_sql: str, from_sql: str,
+                    filters: List[str], params: List, sort, after: Optional[tuple],
+                    limit: int) -> Page:
+        """Keyset pagination: seek past `after` in index order instead of OFFSET"""
+        sort_columns, cursor_of = sort
+        where = list(filters)
+        args = list(params)
+        if after is not None:
+            where.append(f"({', '.join(sort_columns)}) > ({', '.join('?' * len(sort_columns))})")
+            args.extend(after)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = record_factory(record_cls)
+            cursor.execute(f"""
+                {select_sql} {from_sql} {where_sql}
+                ORDER BY {', '.join(sort_columns)}
+                LIMIT ?
+            """, args + [limit + 1])
+            rows = cursor.fetchall()
+
+            total = None
+            if after is None:
+                filter_sql = f"WHERE {' AND '.join(filters)}" if filters else ""
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT COUNT(*) FROM (SELECT 1 {from_sql} {filter_sql} LIMIT ?)
+                """, list(params) + [COUNT_ESTIMATE_CAP])
+                total = cursor.fetchone()[0]
+
+        next_cursor = cursor_of(rows[limit - 1]) if len(rows) > limit else None
+        return Page(rows[:limit], total, next_cursor)
+
     def get_warehouses(self) -> List[Tuple]:
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -216,7 +331,8 @@ class DatabaseManager:
 
     def add_product(self, name: str, description: str, unit_type: str, 
                    min_stock: int, current_stock: int, warehouse_id: int,
-                   suppliers: List[Dict], wholesale_price: float, retail_price: float) -> int:
+                   suppliers: List[Dict], wholesale_price: float, retail_price: float,
+                   barcode: Optional[str] = None) -> int:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -225,9 +341,9 @@ class DatabaseManager:
                 # Add product
                 cursor.execute("""
                     INSERT INTO products (product_name, description, unit_type, 
-                                        min_stock_level, current_stock)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (name, description, unit_type, min_stock, current_stock))
+                                        min_stock_level, current_stock, barcode)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (name, description, unit_type, min_stock, current_stock, barcode or None))
                 
                 product_id = cursor.lastrowid
 
@@ -246,14 +362,15 @@ class DatabaseManager:
                     """, (supplier['supplier_id'], product_id, supplier['supply_price']))
 
                 # Add initial prices
-                cursor.execute("""
-                    INSERT INTO order_details (product_id, quantity, sale_price, price_type)
-                    VALUES 
-                        (?, 1, ?, 'wholesale'),
-                        (?, 1, ?, 'retail')
-                """, (product_id, wholesale_price, product_id, retail_price))
+                self._set_product_prices(cursor, product_id, {
+                    'wholesale': wholesale_price,
+                    'retail': retail_price
+                })
 
                 conn.commit()
+                if warehouse_id:
+                    self.inventory.set_quantities(
+                        product_id, [{'warehouse_id': warehouse_id, 'quantity': current_stock}])
                 return product_id
                 
         except sqlite3.Error as e:
@@ -264,7 +381,8 @@ class DatabaseManager:
     def update_product(self, product_id: int, name: str, description: str, 
                       unit_type: str, min_stock: int, current_stock: int,
                       warehouse_id: int, suppliers: List[Dict],
-                      wholesale_price: float, retail_price: float) -> bool:
+                      wholesale_price: float, retail_price: float,
+                      barcode: Optional[str] = None) -> bool:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -272,9 +390,10 @@ class DatabaseManager:
                 cursor.execute("""
                     UPDATE products 
                     SET product_name = ?, description = ?, unit_type = ?,
-                        min_stock_level = ?, current_stock = ?
+                        min_stock_level = ?, current_stock = ?, barcode = ?
                     WHERE product_id = ?
-                """, (name, description, unit_type, min_stock, current_stock, product_id))
+                """, (name, description, unit_type, min_stock, current_stock,
+                      barcode or None, product_id))
 
                 # Update warehouse association
                 cursor.execute("DELETE FROM warehouse_products WHERE product_id = ?", (product_id,))
@@ -293,18 +412,50 @@ class DatabaseManager:
                     """, (supplier['supplier_id'], product_id, supplier['supply_price']))
 
                 # Update prices
-                cursor.execute("""
-                    INSERT OR REPLACE INTO order_details (product_id, quantity, sale_price, price_type)
-                    VALUES 
-                        (?, 1, ?, 'retail'),
-                        (?, 1, ?, 'wholesale')
-                """, (product_id, retail_price, product_id, wholesale_price))
+                self._set_product_prices(cursor, product_id, {
+                    'wholesale': wholesale_price,
+                    'retail': retail_price
+                })
 
                 conn.commit()
+                # The product's warehouse rows were replaced, not just updated
+                self.inventory.forget_product(product_id)
+                if warehouse_id:
+                    self.inventory.set_quantities(
+                        product_id, [{'warehouse_id': warehouse_id, 'quantity': current_stock}])
                 return True
         except sqlite3.Error:
             return False
 
+    def _set_product_prices(self, cursor, product_id: int, prices: Dict[str, float]):
+        # Close the current price only when it changes, then open the new one
+        cursor.executemany("""
+            UPDATE product_prices
+            SET effective_to = CURRENT_TIMESTAMP
+            WHERE product_id = ? AND price_type = ? AND effective_to IS NULL
+            AND price <> ?
+        """, [(product_id, price_type, price) for price_type, price in prices.items()])
+        cursor.executemany("""
+            INSERT INTO product_prices (product_id, price_type, price)
+            SELECT ?, ?, ?
+            WHERE NOT EXISTS (
+                SELECT 1 FROM product_prices
+                WHERE product_id = ? AND price_type = ? AND effective_to IS NULL
+            )
+        """, [(product_id, price_type, price, product_id, price_type)
+              for price_type, price in prices.items()])
+
+    def get_product_price_history(self, product_id: int) -> List[Tuple]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT price_type, price, effective_from, effective_to
+                FROM product_prices
+                WHERE product_id = ?
+                ORDER BY price_type, price_id
+            """, (product_id,))
+            return cursor.fetchall()
+
     def delete_product(self, product_id: int) -> bool:
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -312,9 +463,11 @@ class DatabaseManager:
             cursor.execute("DELETE FROM supplier_products WHERE product_id = ?", (product_id,))
             cursor.execute("DELETE FROM warehouse_products WHERE product_id = ?", (product_id,))
             cursor.execute("DELETE FROM stock_alerts WHERE product_id = ?", (product_id,))
+            cursor.execute("DELETE FROM product_prices WHERE product_id = ?", (product_id,))
             # Then delete the product
             cursor.execute("DELETE FROM products WHERE product_id = ?", (product_id,))
             conn.commit()
+            self.inventory.forget_product(product_id)
             return cursor.rowcount > 0
 
     def update_product_warehouse(self, product_id: int, updates: list) -> bool:
@@ -344,6 +497,7 @@ class DatabaseManager:
                 """, (total_stock, product_id))
                 
                 conn.commit()
+                self.inventory.set_quantities(product_id, updates)
                 return True
                 
             except sqlite3.Error:
@@ -370,6 +524,279 @@ class DatabaseManager:
             except sqlite3.Error:
                 return False
 
+    def get_products_with_stock(self, as_records: bool = False
+                                ) -> Tuple[List[Tuple], Dict[int, Dict[int, int]]]:
+        """Catalog rows plus every product's stock, for the sales screen.
+
+        The stock is only read; the caller swaps it into the inventory with
+        replace_all() once no queued checkout can be missing from it.
+        """
+        stock = self.inventory.read_all()
+        return self.get_products_with_details(as_records=as_records), stock
+
+    def get_catalog_rows(self, product_ids: Iterable[int],
+                         as_records: bool = False) -> List[Tuple]:
+        """get_products_with_details rows of the given products only"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if as_records:
+                cursor.row_factory = record_factory(ProductRow)
+            cursor.execute("""
+                SELECT product_id, product_name, description, unit_type,
+                       min_stock_level, current_stock, warehouse_name,
+                       min_supply_price, suppliers, wholesale_price, retail_price,
+                       NULLIF(warehouse_id, 0) as warehouse_id
+                FROM product_catalog
+                WHERE product_id IN (SELECT value FROM json_each(?))
+                ORDER BY product_name, product_id, product_catalog.warehouse_id
+            """, (json.dumps(list(product_ids)),))
+            return cursor.fetchall()
+
+    def get_data_version(self) -> Tuple[int, int]:
+        """Token that changes whenever a write may have touched the database.
+
+        PRAGMA data_version only moves for commits made by other connections,
+        so it is paired with this thread's own connection's total_changes.
+        """
+        conn = self.get_connection()
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+    def get_catalog_change_id(self) -> int:
+        """Latest catalog_changes id; pass it to get_catalog_changes later"""
+        conn = self.get_connection()
+        return conn.execute("SELECT COALESCE(MAX(change_id), 0) FROM catalog_changes").fetchone()[0]
+
+    def get_catalog_changes(self, since_id: int) -> Tuple[int, Optional[List[int]]]:
+        """(latest change_id, ids of products changed after since_id).
+
+        The id list is None when changes after since_id were already pruned,
+        in which case the caller has to reload the whole catalog.
+        """
+        conn = self.get_connection()
+        # Separate scalar subqueries, so each is a single b-tree seek
+        first, last = conn.execute("""
+            SELECT (SELECT MIN(change_id) FROM catalog_changes),
+                   (SELECT MAX(change_id) FROM catalog_changes)
+        """).fetchone()
+        if last is None or last <= since_id:
+            return since_id, []
+        if first > since_id + 1:
+            return last, None
+        rows = conn.execute("""
+            SELECT DISTINCT product_id FROM catalog_changes
+            WHERE change_id > ? AND change_id <= ?
+        """, (since_id, last)).fetchall()
+        return last, [row[0] for row in rows]
+
+    def prune_catalog_changes(self, keep: int = CATALOG_CHANGES_KEEP):
+        with self.get_connection() as conn:
+            conn.execute("""
+                DELETE FROM catalog_changes
+                WHERE change_id <= (SELECT MAX(change_id) FROM catalog_changes) - ?
+            """, (keep,))
+
+    def commit_order(self, customer_id: Optional[int], lines: Iterable, subtotal: float,
+                     net_total: float, user_id: int = 1, checkout_id: Optional[str] = None,
+                     update_inventory: bool = True, issued_at: Optional[str] = None,
+                     vat: float = 0.0, vat_percent: float = 0.0) -> int:
+        """Save a sale and its stock movements in one transaction; returns the order_id.
+
+        lines are cart lines (product_id, warehouse_id, quantity, unit_price,
+        price_type) already allocated to their source warehouses. The work
+        takes a fixed 11 statements plus COMMIT whatever the number of lines:
+        per-line writes go through executemany, and the cost lookup and stock
+        alerts are set-based over the sold products.
+
+        A checkout_id makes the call idempotent: if an order with that id was
+        already committed, nothing is written and its order_id is returned.
+        Warehouse stock is only decremented where it covers the sale; otherwise
+        the order is rolled back and InsufficientStock raised. Raises
+        sqlite3.Error after rolling back.
+
+        issued_at ('%Y-%m-%d %H:%M:%S', now when None), vat and vat_percent
+        are saved with the invoice so get_saved_invoice() can reprint it.
+        """
+        lines = list(lines)
+        product_qty: Dict[int, int] = {}
+        for line in lines:
+            product_qty[line.product_id] = product_qty.get(line.product_id, 0) + line.quantity
+        warehouse_qty = warehouse_decrements(lines)
+        priced_lines = json.dumps([[line.product_id, line.quantity, line.unit_price]
+                                   for line in lines])
+        product_ids = json.dumps(list(product_qty))
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                INSERT INTO orders (customer_id, order_date, total_price, checkout_id)
+                VALUES (?, DATE('now'), ?, ?)
+                ON CONFLICT DO NOTHING
+            """, (customer_id, subtotal, checkout_id))
+            if cursor.rowcount == 0:
+                # Replayed checkout that already committed
+                conn.rollback()
+                cursor.execute("SELECT order_id FROM orders WHERE checkout_id = ?", (checkout_id,))
+                return cursor.fetchone()[0]
+            order_id = cursor.lastrowid
+
+            cursor.executemany("""
+                INSERT INTO order_details (order_id, product_id, quantity, sale_price, price_type)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(order_id, line.product_id, line.quantity, line.unit_price, line.price_type)
+                  for line in lines])
+            cursor.executemany("""
+                UPDATE products SET current_stock = current_stock - ? WHERE product_id = ?
+            """, [(quantity, product_id) for product_id, quantity in product_qty.items()])
+            cursor.executemany("""
+                UPDATE warehouse_products SET quantity = quantity - ?
+                WHERE warehouse_id = ? AND product_id = ? AND quantity >= ?
+            """, [(quantity, warehouse_id, product_id, quantity)
+                  for (warehouse_id, product_id), quantity in warehouse_qty.items()])
+            # rowcount sums over executemany; a skipped row means stock ran short
+            if cursor.rowcount != len(warehouse_qty):
+                conn.rollback()
+                raise self._stock_shortfall(warehouse_qty)
+
+            # Profit against the lowest supply price of each product
+            cursor.execute("""
+                SELECT COALESCE(SUM((json_extract(l.value, '$[2]') - COALESCE(
+                           (SELECT MIN(sp.supply_price) FROM supplier_products sp
+                            WHERE sp.product_id = json_extract(l.value, '$[0]')), 0))
+                       * json_extract(l.value, '$[1]')), 0)
+                FROM json_each(?) l
+            """, (priced_lines,))
+            profit = cursor.fetchone()[0]
+
+            # Raise or refresh alerts for sold products now at or below their minimum
+            low_stock = """
+                FROM products p
+                WHERE p.product_id IN (SELECT value FROM json_each(?))
+                AND p.current_stock <= p.min_stock_level
+            """
+            cursor.execute(f"""
+                UPDATE stock_alerts
+                SET current_stock = (SELECT p.current_stock FROM products p
+                                     WHERE p.product_id = stock_alerts.product_id),
+                    alert_threshold = (SELECT p.min_stock_level FROM products p
+                                       WHERE p.product_id = stock_alerts.product_id),
+                    alert_status = TRUE
+                WHERE product_id IN (SELECT p.product_id {low_stock})
+            """, (product_ids,))
+            cursor.execute(f"""
+                INSERT INTO stock_alerts (product_id, current_stock, alert_threshold, alert_status)
+                SELECT p.product_id, p.current_stock, p.min_stock_level, TRUE
+                {low_stock}
+                AND NOT EXISTS (SELECT 1 FROM stock_alerts a WHERE a.product_id = p.product_id)
+            """, (product_ids,))
+            cursor.execute(f"""
+                INSERT INTO notifications (notification_type, notification_content)
+                SELECT 'تنبيه المخزون',
+                       'المنتج ' || p.product_id || ' وصل للحد الأدنى للمخزون: ' || p.current_stock
+                {low_stock}
+            """, (product_ids,))
+
+            cursor.execute("""
+                INSERT INTO invoices (order_id, total_amount, profit, invoice_date,
+                                      issued_at, vat_percent, vat_amount)
+                VALUES (?, ?, ?, DATE('now'), COALESCE(?, DATETIME('now', 'localtime')), ?, ?)
+            """, (order_id, net_total, profit, issued_at, vat_percent, vat))
+            cursor.execute("""
+                INSERT INTO activity_logs (user_id, action_type, action_details)
+                VALUES (?, 'طلب جديد', ?)
+            """, (user_id, f"تم إنشاء طلب جديد برقم {order_id}"))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+        if update_inventory:
+            self.inventory.apply_sale((line.product_id, line.warehouse_id, line.quantity)
+                                      for line in lines)
+        return order_id
+
+    def get_saved_invoice(self, order_id: int) -> Optional[dict]:
+        """What the invoice of a committed order printed, or None if it has no invoice.
+
+        Keys: order_id, issued_at, subtotal, net, vat_percent, vat, customer
+        (name, address, phone tuple or None) and lines ((product_name,
+        quantity, unit_price) in sale order; lines of since deleted products
+        keep a placeholder name). Invoices saved before their time was stored
+        have only the date in issued_at.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT o.order_id, COALESCE(i.issued_at, i.invoice_date), o.total_price,
+                       i.total_amount, i.vat_percent, i.vat_amount,
+                       c.customer_name, c.address, c.phone_number
+                FROM orders o
+                JOIN invoices i ON i.order_id = o.order_id
+                LEFT JOIN customers c ON c.customer_id = o.customer_id
+                WHERE o.order_id = ?
+            """, (order_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute("""
+                SELECT COALESCE(p.product_name, 'صنف محذوف ' || d.product_id),
+                       d.quantity, d.sale_price
+                FROM order_details d
+                LEFT JOIN products p ON p.product_id = d.product_id
+                WHERE d.order_id = ?
+                ORDER BY d.order_detail_id
+            """, (order_id,))
+            lines = cursor.fetchall()
+        return {
+            'order_id': row[0],
+            'issued_at': row[1],
+            'subtotal': row[2] or 0.0,
+            'net': row[3] or 0.0,
+            'vat_percent': row[4] or 0.0,
+            'vat': row[5] or 0.0,
+            'customer': (row[6], row[7] or '', row[8] or '') if row[6] is not None else None,
+            'lines': lines,
+        }
+
+    def _stock_shortfall(self, warehouse_qty: Dict[Tuple[Optional[int], int], int]
+                         ) -> InsufficientStock:
+        """InsufficientStock for the first (warehouse_id, product_id) that cannot cover its sale"""
+        shortfall = None
+        for (warehouse_id, product_id), quantity in warehouse_qty.items():
+            available = self.get_warehouse_product_quantity(warehouse_id, product_id) or 0
+            shortfall = InsufficientStock(product_id, warehouse_id, available)
+            if available < quantity:
+                break
+        return shortfall
+
+    def get_barcodes(self, product_ids: Optional[Iterable[int]] = None) -> Dict[int, str]:
+        """product_id -> barcode for every product (or every given product) that has one"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if product_ids is None:
+                cursor.execute("SELECT product_id, barcode FROM products WHERE barcode IS NOT NULL")
+            else:
+                cursor.execute("""
+                    SELECT product_id, barcode FROM products
+                    WHERE barcode IS NOT NULL AND product_id IN (SELECT value FROM json_each(?))
+                """, (json.dumps(list(product_ids)),))
+            return dict(cursor.fetchall())
+
+    def get_product_barcode(self, product_id: int) -> Optional[str]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT barcode FROM products WHERE product_id = ?", (product_id,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    def get_product_id_by_barcode(self, barcode: str) -> Optional[int]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT product_id FROM products WHERE barcode = ?", (barcode,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
     def get_warehouse_product_quantity(self, warehouse_id, product_id):
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -400,7 +827,7 @@ class DatabaseManager:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT INTO customers (customer_name, address, phone_number, discount_percentage)
+                INSERT INTO customers (customer_name, address, phone_number, discount_amount)
                 VALUES (?, ?, ?, ?)
             """, (name, address, phone, discount))
             conn.commit()
@@ -435,9 +862,11 @@ class DatabaseManager:
             conn.commit()
             return cursor.lastrowid
 
-    def get_customers(self):
+    def get_customers(self, as_records: bool = False) -> List[Tuple]:
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            if as_records:
+                cursor.row_factory = record_factory(CustomerRow)
             cursor.execute("""
                 SELECT customer_id, customer_name, address, phone_number, 
                        discount_amount as discount
@@ -446,6 +875,17 @@ class DatabaseManager:
             """)
             return cursor.fetchall()
 
+    def get_customers_page(self, filter_text: str = "", sort_key: str = 'name',
+                           after: Optional[tuple] = None, limit: int = 100) -> Page:
+        filters, params = [], []
+        if filter_text:
+            filters.append("(instr(customer_name, ?) > 0 OR instr(phone_number, ?) > 0)")
+            params.extend([filter_text, filter_text])
+        return self._fetch_page(CustomerRow, """
+            SELECT customer_id, customer_name, address, phone_number,
+                   discount_amount as discount
+        """, "FROM customers", filters, params, CUSTOMER_SORT_KEYS[sort_key], after, limit)
+
     def update_customer(self, customer_id: int, name: str, address: str, 
                        phone: str, discount: float) -> bool:
         with self.get_connection() as conn:
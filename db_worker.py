@@ -0,0 +1,91 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from PyQt6.QtCore import QObject, pyqtSignal
+from query_instrumentation import current_action, ui_action
+
+DEFAULT_WORKERS = 2
+
+
+class QueryExecutor(QObject):
+    """Runs database calls on worker threads and hands results back to the GUI thread"""
+
+    # Emitted from worker threads; queued onto the thread that owns the executor
+    _finished = pyqtSignal(object, object, object, object, object)
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, parent=None):
+        super().__init__(parent)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='db-worker')
+        self._latest: Dict[str, Future] = {}
+        self._finished.connect(self._deliver)
+
+    def submit(self, fn: Callable, *args, key: Optional[str] = None,
+               on_result: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, **kwargs) -> Future:
+        """Run fn(*args, **kwargs) off the GUI thread.
+
+        Requests sharing a key supersede each other: a newer submit cancels
+        the older one if it has not started, and drops its result if it has.
+        """
+        if key is not None:
+            self.cancel(key)
+        # Statements run by the worker are attributed to the submitting UI action
+        action = current_action() or key
+        future = self._pool.submit(self._run, action, fn, args, kwargs)
+        if key is not None:
+            self._latest[key] = future
+        future.add_done_callback(
+            lambda done: self._emit_finished(done, key, on_result, on_error))
+        return future
+
+    def cancel(self, key: str) -> bool:
+        """Cancel the pending request for key; its result will be ignored"""
+        future = self._latest.pop(key, None)
+        return future.cancel() if future is not None else False
+
+    def shutdown(self, wait: bool = True):
+        for future in self._latest.values():
+            future.cancel()
+        self._latest.clear()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    @staticmethod
+    def _run(action, fn, args, kwargs):
+        with ui_action(action):
+            return fn(*args, **kwargs)
+
+    def _emit_finished(self, future, key, on_result, on_error):
+        if future.cancelled():
+            return
+        self._finished.emit(future, key, on_result, on_error, future.exception())
+
+    def _deliver(self, future, key, on_result, on_error, error):
+        if key is not None:
+            if self._latest.get(key) is not future:
+                return  # superseded by a newer request
+            del self._latest[key]
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                print(f"Background query failed: {error}")
+        elif on_result is not None:
+            on_result(future.result())
+
+
+_executor: Optional[QueryExecutor] = None
+
+
+def get_executor() -> QueryExecutor:
+    """Shared executor; must first be called from the GUI thread"""
+    global _executor
+    if _executor is None:
+        _executor = QueryExecutor()
+    return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait)
+        _executor = None
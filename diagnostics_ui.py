@@ -0,0 +1,118 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget,
+                             QTableWidgetItem, QPushButton, QLabel, QAbstractItemView)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor
+import query_instrumentation
+import product_search
+from query_instrumentation import HISTOGRAM_BUCKETS_MS
+
+
+class QueryDiagnosticsDialog(QDialog):
+    """نافذة مخفية لعرض إحصائيات استعلامات قاعدة البيانات"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("تشخيص الاستعلامات")
+        self.resize(1100, 600)
+        self.setLayoutDirection(Qt.LayoutDirection.RightToLeft)
+        self.setup_ui()
+        self.load_stats()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        bucket_labels = [f"≤{b}ms" for b in HISTOGRAM_BUCKETS_MS]
+        bucket_labels.append(f">{HISTOGRAM_BUCKETS_MS[-1]}ms")
+        self.headers = ["الاستعلام", "مرات التنفيذ", "المتوسط (ms)", "الأقصى (ms)",
+                        "الإجمالي (ms)", "الصفوف", "الإجراءات", "خطة التنفيذ"] + bucket_labels
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(self.headers))
+        self.table.setHorizontalHeaderLabels(self.headers)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        refresh_btn = QPushButton("تحديث")
+        reset_btn = QPushButton("تصفير الإحصائيات")
+        close_btn = QPushButton("إغلاق")
+        refresh_btn.clicked.connect(self.load_stats)
+        reset_btn.clicked.connect(self.reset_stats)
+        close_btn.clicked.connect(self.close)
+        for btn in [refresh_btn, reset_btn, close_btn]:
+            buttons_layout.addWidget(btn)
+        layout.addLayout(buttons_layout)
+
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #1c2841;
+            }
+            QLabel {
+                color: #c5a572;
+                font-size: 14px;
+            }
+            QTableWidget {
+                background-color: rgba(10, 17, 40, 0.95);
+                color: #c5a572;
+                border: none;
+            }
+            QHeaderView::section {
+                background-color: #0a1128;
+                color: #c5a572;
+                padding: 5px;
+                border: 1px solid #c5a572;
+            }
+            QPushButton {
+                background-color: #c5a572;
+                color: #0a1128;
+                border: none;
+                border-radius: 5px;
+                padding: 8px 15px;
+                font-size: 14px;
+            }
+            QPushButton:hover {
+                background-color: #d4af37;
+            }
+        """)
+
+    def load_stats(self):
+        entries = query_instrumentation.stats.snapshot()
+        self.table.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            values = [
+                entry['sql'],
+                entry['count'],
+                f"{entry['total_ms'] / entry['count']:.2f}",
+                f"{entry['max_ms']:.2f}",
+                f"{entry['total_ms']:.2f}",
+                entry['rows'],
+                ", ".join(entry['actions']),
+                " | ".join(entry['plan']) if entry['plan'] else "",
+            ] + entry['buckets']
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if col == 0:
+                    item.setToolTip(entry['sql'])
+                self.table.setItem(row, col, item)
+            # تمييز الاستعلامات التي تمسح الجدول بالكامل
+            if entry['plan']:
+                for col in range(len(values)):
+                    self.table.item(row, col).setForeground(QColor("#ff4444"))
+        self.table.setColumnWidth(0, 400)
+
+        total = sum(entry['count'] for entry in entries)
+        latency = product_search.latency
+        average = latency.total_ms / latency.count if latency.count else 0
+        self.summary_label.setText(
+            f"عدد الاستعلامات: {total} - حد الاستعلام البطيء: "
+            f"{query_instrumentation.SLOW_QUERY_MS:g}ms - السجل: {query_instrumentation.SLOW_QUERY_LOG}\n"
+            f"البحث في المنتجات: {latency.count} ضغطة - المتوسط {average:.2f}ms - "
+            f"الأقصى {latency.max_ms:.2f}ms - تجاوز {product_search.FRAME_BUDGET_MS:g}ms: "
+            f"{latency.over_budget}"
+        )
+
+    def reset_stats(self):
+        query_instrumentation.stats.reset()
+        self.load_stats()
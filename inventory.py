@@ -0,0 +1,173 @@
+import json
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from connection_pool import get_pool
+
+
+class InsufficientStock(Exception):
+    """A warehouse holds less of a product than is being reserved or sold"""
+
+    def __init__(self, product_id: int, warehouse_id: Optional[int], available: int):
+        super().__init__(f"Only {available} of product {product_id} available "
+                         f"in warehouse {warehouse_id}")
+        self.product_id = product_id
+        self.warehouse_id = warehouse_id
+        self.available = available
+
+
+class InventorySnapshot:
+    """In-memory product x warehouse quantities, loaded with one query.
+
+    Reads never touch the database; writers that change stock report the
+    change here after their transaction commits so the snapshot stays current.
+
+    Open carts reserve stock in a ledger kept beside the quantities, so
+    available() is what is left to sell across every cart in the process.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # product_id -> {warehouse_id: quantity}, so a product's warehouses
+        # are one lookup away for allocation
+        self._stock: Dict[int, Dict[int, int]] = {}
+        self._reserved: Dict[Tuple[int, int], int] = {}
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """Replace the snapshot with the current warehouse_products table"""
+        self.replace_all(self.read_all())
+
+    def read_all(self) -> Dict[int, Dict[int, int]]:
+        """Current database quantities of every product, without touching the snapshot"""
+        conn = get_pool(self.db_path).get_connection()
+        rows = conn.execute("""
+            SELECT product_id, warehouse_id, quantity FROM warehouse_products
+        """).fetchall()
+        return _group(rows)
+
+    def replace_all(self, stock: Dict[int, Dict[int, int]]):
+        """Swap in a read_all() result; reservations are kept"""
+        with self._lock:
+            self._stock = stock
+            self._loaded = True
+
+    def read_quantities(self, product_ids: Iterable[int]) -> Dict[int, Dict[int, int]]:
+        """Current database quantities of some products, without touching the snapshot"""
+        conn = get_pool(self.db_path).get_connection()
+        rows = conn.execute("""
+            SELECT product_id, warehouse_id, quantity FROM warehouse_products
+            WHERE product_id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(list(product_ids)),)).fetchall()
+        return _group(rows)
+
+    def replace_quantities(self, product_ids: Iterable[int],
+                           quantities: Dict[int, Dict[int, int]]):
+        """Swap in read_quantities() results for writes made outside this snapshot"""
+        with self._lock:
+            for product_id in product_ids:
+                warehouses = quantities.get(product_id)
+                if warehouses:
+                    self._stock[product_id] = dict(warehouses)
+                else:
+                    self._stock.pop(product_id, None)
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def quantity(self, product_id: int, warehouse_id: Optional[int]) -> int:
+        # Products stocked in no warehouse have nothing to sell
+        if warehouse_id is None:
+            return 0
+        return self._stock.get(product_id, {}).get(warehouse_id, 0)
+
+    def available(self, product_id: int, warehouse_id: Optional[int]) -> int:
+        """Quantity not yet reserved by any cart"""
+        if warehouse_id is None:
+            return 0
+        return (self._stock.get(product_id, {}).get(warehouse_id, 0)
+                - self._reserved.get((product_id, warehouse_id), 0))
+
+    def available_by_warehouse(self, product_id: int) -> Dict[int, int]:
+        """warehouse_id -> unreserved quantity for every warehouse stocking the product"""
+        return {warehouse_id: quantity - self._reserved.get((product_id, warehouse_id), 0)
+                for warehouse_id, quantity in self._stock.get(product_id, {}).items()}
+
+    def total_available(self, product_id: int) -> int:
+        return sum(self.available_by_warehouse(product_id).values())
+
+    def reserve(self, product_id: int, warehouse_id: Optional[int], quantity: int):
+        """Hold quantity for a cart; raises InsufficientStock if it is not available"""
+        with self._lock:
+            available = self.available(product_id, warehouse_id)
+            if quantity > available:
+                raise InsufficientStock(product_id, warehouse_id, available)
+            key = (product_id, warehouse_id)
+            self._reserved[key] = self._reserved.get(key, 0) + quantity
+
+    def release(self, product_id: int, warehouse_id: Optional[int], quantity: int):
+        """Give back stock a cart reserved but did not sell"""
+        with self._lock:
+            self._unreserve((product_id, warehouse_id), quantity)
+
+    def commit_reserved(self, lines: Iterable[Tuple[int, Optional[int], int]]):
+        """Turn reserved (product_id, warehouse_id, quantity) lines into a sale"""
+        with self._lock:
+            for product_id, warehouse_id, quantity in lines:
+                self._unreserve((product_id, warehouse_id), quantity)
+                self._subtract(product_id, warehouse_id, quantity)
+
+    def _unreserve(self, key: Tuple[int, Optional[int]], quantity: int):
+        reserved = self._reserved.get(key, 0) - quantity
+        if reserved > 0:
+            self._reserved[key] = reserved
+        else:
+            self._reserved.pop(key, None)
+
+    def _subtract(self, product_id: int, warehouse_id: Optional[int], quantity: int):
+        warehouses = self._stock.get(product_id)
+        if warehouses is not None and warehouse_id in warehouses:
+            warehouses[warehouse_id] -= quantity
+
+    def apply_sale(self, lines: Iterable[Tuple[int, Optional[int], int]]):
+        """Subtract committed (product_id, warehouse_id, quantity) sale lines"""
+        with self._lock:
+            for product_id, warehouse_id, quantity in lines:
+                self._subtract(product_id, warehouse_id, quantity)
+
+    def set_quantities(self, product_id: int, updates: Iterable[dict]):
+        """Record committed stock edits given as {'warehouse_id', 'quantity'} dicts"""
+        with self._lock:
+            warehouses = self._stock.setdefault(product_id, {})
+            for update in updates:
+                warehouses[update['warehouse_id']] = update['quantity']
+
+    def forget_product(self, product_id: int):
+        with self._lock:
+            self._stock.pop(product_id, None)
+
+
+def _group(rows) -> Dict[int, Dict[int, int]]:
+    stock: Dict[int, Dict[int, int]] = {}
+    for product_id, warehouse_id, quantity in rows:
+        stock.setdefault(product_id, {})[warehouse_id] = quantity or 0
+    return stock
+
+
+_snapshots: Dict[str, InventorySnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot(db_path: str) -> InventorySnapshot:
+    """Shared snapshot for db_path, so every window sees the same stock"""
+    with _snapshots_lock:
+        snapshot = _snapshots.get(db_path)
+        if snapshot is None:
+            snapshot = _snapshots[db_path] = InventorySnapshot(db_path)
+        return snapshot
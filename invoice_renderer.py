@@ -0,0 +1,296 @@
+import json
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+import qrcode
+from reportlab.graphics.shapes import Drawing, Rect
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph
+from reportlab.platypus import Table, Spacer
+
+from invoice_templates import SELLER_NAME, TAX_NUMBER, PreparedTemplate, prepare_template
+from text_shaping import shape, shape_many, shape_wrapped
+
+# Rendering runs in worker processes: nothing here may import Qt or hold
+# references to widgets, and everything passed in must pickle.
+
+# QR codes kept per process; a batch of reprints repeats payloads
+QR_CACHE_SIZE = 256
+
+
+class InvoiceCustomer(NamedTuple):
+    name: str
+    address: str = ''
+    phone: str = ''
+
+
+class InvoiceLine(NamedTuple):
+    product_name: str
+    quantity: int
+    unit_price: float
+    total: float
+
+
+class InvoiceSnapshot(NamedTuple):
+    """Everything printed on an invoice, frozen when printing was requested"""
+    order_id: Optional[int]
+    issued_at: str                      # '%Y-%m-%d %H:%M:%S'
+    customer: Optional[InvoiceCustomer]
+    lines: Tuple[InvoiceLine, ...]
+    subtotal: float
+    discount: float
+    net: float
+    vat_enabled: bool
+    vat_percent: float
+    vat: float
+    total: float
+
+    @classmethod
+    def from_saved(cls, saved: dict):
+        """Snapshot of a committed order from DatabaseManager.get_saved_invoice()"""
+        lines = tuple(InvoiceLine(name, quantity, price, quantity * price)
+                      for name, quantity, price in saved['lines'])
+        net, vat = saved['net'], saved['vat']
+        return cls(
+            order_id=saved['order_id'],
+            issued_at=saved['issued_at'],
+            customer=InvoiceCustomer(*saved['customer']) if saved['customer'] else None,
+            lines=lines,
+            subtotal=saved['subtotal'],
+            discount=round(saved['subtotal'] - net, 2),
+            net=net,
+            vat_enabled=bool(saved['vat_percent']),
+            vat_percent=saved['vat_percent'],
+            vat=vat,
+            total=net + vat,
+        )
+
+    @property
+    def filename(self) -> str:
+        stamp = self.issued_at.replace('-', '').replace(':', '').replace(' ', '_')
+        return f"invoice_{self.order_id}_{stamp}.pdf"
+
+
+def render_invoice(invoice: InvoiceSnapshot, filename: Optional[str] = None,
+                   template: Optional[str] = None) -> str:
+    """Write the invoice PDF with the named template (the terminal's default when None) and return its path"""
+    filename = filename or invoice.filename
+    prepared = prepare_template(template)
+    page = prepared.template
+
+    if page.receipt:
+        elements = receipt_elements(invoice, prepared)
+    else:
+        elements = page_elements(invoice, prepared)
+
+    # ورق الرول بطول الفاتورة نفسها
+    page_height = page.page_height or roll_height(elements, prepared)
+    doc = SimpleDocTemplate(
+        filename,
+        pagesize=(page.page_width, page_height),
+        rightMargin=page.margin,
+        leftMargin=page.margin,
+        topMargin=page.margin,
+        bottomMargin=page.margin
+    )
+    doc.build(elements)
+    return filename
+
+
+def roll_height(elements: list, prepared: PreparedTemplate) -> float:
+    """Page height that fits elements on one page of roll paper"""
+    # 12: the frame's own padding; 2: slack so rounding never pushes a flowable over
+    height = sum(element.wrap(prepared.width, 1e6)[1] for element in elements)
+    return height + 2 * prepared.template.margin + 12 + 2
+
+
+def total_rows(invoice: InvoiceSnapshot) -> List[Tuple[str, float]]:
+    """(label, amount) rows printed under the items"""
+    rows = [("الإجمالي", invoice.subtotal)]
+    if invoice.discount > 0:
+        rows.append(("الخصم", invoice.discount))
+    rows.append(("الصافي", invoice.net))
+    if invoice.vat_enabled:
+        rows.append((f"ضريبة القيمة المضافة {invoice.vat_percent:g}%", invoice.vat))
+        rows.append(("الإجمالي شامل الضريبة", invoice.total))
+    return rows
+
+
+def page_elements(invoice: InvoiceSnapshot, prepared: PreparedTemplate) -> list:
+    """Flowables of the full-page layout (A4, A5)"""
+    page = prepared.template
+    elements = []
+
+    # شعار الشركة
+    logo_table = Table([[prepared.logo()]], colWidths=[prepared.width])
+    logo_table.setStyle(prepared.logo_style)
+    elements.append(logo_table)
+    elements.append(Spacer(1, 20))
+
+    # ترويسة الفاتورة: النصوص الثابتة مجهزة مسبقاً في القالب
+    issued_date, _, issued_time = invoice.issued_at.partition(' ')
+    header_data = [
+        [shape('رقم الفاتورة: ' + str(invoice.order_id)), prepared.title],
+        [shape(f'التاريخ: {issued_date}'), prepared.seller],
+        [shape(f'الوقت: {issued_time}'), prepared.tax_number]
+    ]
+    header_table = Table(header_data, colWidths=[prepared.width / 2] * 2)
+    header_table.setStyle(prepared.header_style)
+    elements.append(header_table)
+    elements.append(Spacer(1, 20))
+
+    # معلومات العميل
+    if invoice.customer:
+        customer_data = [
+            [prepared.customer_title],
+            [shape(f"الاسم: {invoice.customer.name}")],
+            [shape(f"العنوان: {invoice.customer.address}")],
+            [shape(f"رقم الهاتف: {invoice.customer.phone}")],
+        ]
+    else:
+        customer_data = [[prepared.cash_customer]]
+
+    customer_table = Table(customer_data, colWidths=[prepared.width])
+    customer_table.setStyle(prepared.customer_style)
+    elements.append(customer_table)
+    elements.append(Spacer(1, 20))
+
+    # جدول المنتجات
+    products_data = [list(prepared.item_headings)]
+
+    # أسماء الأصناف تُشكّل دفعة واحدة، والمكرر منها يُشكّل مرة واحدة
+    product_names = shape_many(line.product_name for line in invoice.lines)
+    for row, (line, product_name) in enumerate(zip(invoice.lines, product_names)):
+        products_data.append([
+            f"{line.total:.2f}",
+            f"{line.unit_price:.2f}",
+            str(line.quantity),
+            product_name,
+            str(row + 1)
+        ])
+
+    # صفوف الإجمالي والخصم والصافي والضريبة
+    for label, amount in total_rows(invoice):
+        products_data.append([f"{amount:.2f}", "", "", shape(label), ""])
+
+    products_table = Table(products_data, colWidths=prepared.item_widths, repeatRows=1)
+    products_table.setStyle(prepared.items_style)
+    elements.append(products_table)
+    elements.append(Spacer(1, 20))
+
+    # إضافة QR code
+    qr_table = qr_code_table(invoice, page.qr_size, prepared)
+    if qr_table:
+        elements.append(qr_table)
+
+    # إضافة التذييل
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph(prepared.footer, prepared.footer_style))
+    return elements
+
+
+def receipt_elements(invoice: InvoiceSnapshot, prepared: PreparedTemplate) -> list:
+    """Flowables of the narrow receipt layout (80mm roll)"""
+    page = prepared.template
+    elements = []
+
+    logo_table = Table([[prepared.logo()]], colWidths=[prepared.width])
+    logo_table.setStyle(prepared.logo_style)
+    elements.append(logo_table)
+
+    # الترويسة في عمود واحد
+    header_data = [
+        [prepared.seller],
+        [prepared.title],
+        [prepared.tax_number],
+        [shape('رقم الفاتورة: ' + str(invoice.order_id))],
+        [shape(f'التاريخ: {invoice.issued_at}')],
+    ]
+    header_table = Table(header_data, colWidths=[prepared.width])
+    header_table.setStyle(prepared.header_style)
+    elements.append(header_table)
+
+    if invoice.customer:
+        customer_data = [[shape(f"العميل: {invoice.customer.name}")]]
+        if invoice.customer.phone:
+            customer_data.append([shape(f"رقم الهاتف: {invoice.customer.phone}")])
+    else:
+        customer_data = [[prepared.cash_customer]]
+    customer_table = Table(customer_data, colWidths=[prepared.width])
+    customer_table.setStyle(prepared.customer_style)
+    elements.append(customer_table)
+
+    # أسماء الأصناف الطويلة تُقسم على أكثر من سطر لتناسب عرض الورق
+    products_data = [list(prepared.item_headings)]
+    for line in invoice.lines:
+        product_name = shape_wrapped(line.product_name, prepared.regular,
+                                     page.text_size, prepared.name_width)
+        products_data.append([
+            f"{line.total:.2f}",
+            f"{line.unit_price:.2f}",
+            str(line.quantity),
+            "\n".join(product_name),
+        ])
+    for label, amount in total_rows(invoice):
+        products_data.append([f"{amount:.2f}", "", "", shape(label)])
+
+    products_table = Table(products_data, colWidths=prepared.item_widths)
+    products_table.setStyle(prepared.items_style)
+    elements.append(products_table)
+    elements.append(Spacer(1, page.padding * 2))
+
+    qr_table = qr_code_table(invoice, page.qr_size, prepared)
+    if qr_table:
+        elements.append(qr_table)
+
+    elements.append(Paragraph(prepared.footer, prepared.footer_style))
+    return elements
+
+
+def qr_payload(invoice: InvoiceSnapshot) -> str:
+    """محتوى QR code: من بيانات الفاتورة المحفوظة فقط حتى تطابق إعادة الطباعة الأصل"""
+    return json.dumps({
+        'seller_name': SELLER_NAME,
+        'tax_number': TAX_NUMBER,
+        'invoice_number': invoice.order_id,
+        'invoice_date': invoice.issued_at,
+        'total_amount': round(invoice.total, 2),
+        'tax_amount': round(invoice.vat, 2),
+    }, ensure_ascii=False)
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_drawing(payload: str, size: float) -> Drawing:
+    """QR code as vector shapes, size points square; drawings hold no per-document state"""
+    qr = qrcode.QRCode(border=5)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    module = size / len(matrix)
+    drawing = Drawing(size, size)
+    for y, row in enumerate(matrix):
+        # One rectangle per run of dark modules keeps the PDF small
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            drawing.add(Rect(start * module, size - (y + 1) * module, (x - start) * module,
+                             module, fillColor=colors.black, strokeColor=None))
+    return drawing
+
+
+def qr_code_table(invoice: InvoiceSnapshot, size: float,
+                  prepared: PreparedTemplate) -> Optional[Table]:
+    """إنشاء QR code للفاتورة"""
+    try:
+        qr_table = Table([[qr_drawing(qr_payload(invoice), size)]],
+                         colWidths=[size], rowHeights=[size])
+        qr_table.setStyle(prepared.qr_style)
+        return qr_table
+    except Exception as e:
+        print(f"Error generating QR code: {e}")
+        return None
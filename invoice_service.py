@@ -0,0 +1,105 @@
+import heapq
+import itertools
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from invoice_renderer import InvoiceSnapshot, render_invoice
+from invoice_templates import warm_up
+
+DEFAULT_WORKERS = 2
+
+# Lower runs first; jobs of equal priority run in submission order
+PRIORITY_COUNTER = 0    # reprint requested by the cashier at the counter
+PRIORITY_SALE = 10      # invoice of a sale that was just saved
+PRIORITY_BATCH = 100    # background batches, e.g. end-of-day reprints
+
+
+class InvoiceService(QObject):
+    """Renders invoice PDFs in worker processes, highest priority first.
+
+    Jobs wait in a priority queue and only reach the process pool when a
+    worker is free, so a counter reprint overtakes queued batch jobs
+    instead of waiting behind them. Completion is reported on the thread
+    that owns the service.
+    """
+
+    rendered = pyqtSignal(int, str)    # job_id, pdf path
+    failed = pyqtSignal(int, str)      # job_id, error
+
+    # Emitted from the pool's callback thread; queued onto the owner's thread
+    _finished = pyqtSignal(int, object)
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, parent=None):
+        super().__init__(parent)
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue: List[Tuple[int, int, InvoiceSnapshot, Optional[str]]] = []
+        self._ids = itertools.count(1)
+        self._running = 0
+        self._finished.connect(self._deliver)
+
+    def submit(self, invoice: InvoiceSnapshot, filename: Optional[str] = None,
+               priority: int = PRIORITY_SALE) -> int:
+        """Queue invoice for rendering; returns the job id reported by the signals"""
+        job_id = next(self._ids)
+        heapq.heappush(self._queue, (priority, job_id, invoice, filename))
+        self._dispatch()
+        return job_id
+
+    def pending(self) -> int:
+        return len(self._queue) + self._running
+
+    def shutdown(self, wait: bool = True):
+        """Drop queued jobs; wait for the ones already rendering"""
+        self._queue.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def _dispatch(self):
+        while self._queue and self._running < self.max_workers:
+            _, job_id, invoice, filename = heapq.heappop(self._queue)
+            if self._pool is None:
+                # Started on first use so the workers cost nothing until printing;
+                # each worker prepares the terminal's invoice template (fonts,
+                # scaled logo, styles) once as it starts
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 initializer=warm_up)
+            self._running += 1
+            future = self._pool.submit(render_invoice, invoice, filename)
+            future.add_done_callback(lambda done, job_id=job_id: self._finished.emit(job_id, done))
+
+    def _deliver(self, job_id: int, future: Future):
+        self._running -= 1
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            if isinstance(error, BrokenProcessPool):
+                # A worker died; the next job starts a fresh pool
+                self._pool = None
+            self.failed.emit(job_id, str(error))
+        else:
+            self.rendered.emit(job_id, future.result())
+        self._dispatch()
+
+
+_service: Optional[InvoiceService] = None
+
+
+def get_invoice_service() -> InvoiceService:
+    """Shared service; must first be called from the GUI thread"""
+    global _service
+    if _service is None:
+        _service = InvoiceService()
+    return _service
+
+
+def shutdown_invoice_service(wait: bool = True):
+    global _service
+    if _service is not None:
+        _service.shutdown(wait)
+        _service = None
@@ -0,0 +1,253 @@
+import io
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, A5
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.platypus import Image, TableStyle
+
+from text_shaping import shape, shape_many
+from typography import font_name
+
+# Bundled family used for invoices; Amiri ships both regular and bold faces
+INVOICE_FONT_FAMILY = 'Amiri'
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'noor_alislam.png')
+# Logo pixels per point once scaled down, about 200 dpi on paper
+LOGO_SCALE = 3
+
+SELLER_NAME = 'نور الإسلام'
+TAX_NUMBER = '123456789'
+
+
+class InvoiceTemplate(NamedTuple):
+    name: str
+    page_width: float
+    page_height: Optional[float]    # None for roll paper: the page is as long as the invoice
+    margin: float
+    logo_size: float
+    title_size: float
+    text_size: float
+    padding: float
+    qr_size: float
+    receipt: bool                   # narrow layout: stacked header, no row numbers
+
+
+TEMPLATES: Dict[str, InvoiceTemplate] = {
+    'a4': InvoiceTemplate('a4', A4[0], A4[1], margin=20, logo_size=100, title_size=14,
+                          text_size=12, padding=8, qr_size=100, receipt=False),
+    'a5': InvoiceTemplate('a5', A5[0], A5[1], margin=14, logo_size=70, title_size=11,
+                          text_size=9, padding=5, qr_size=80, receipt=False),
+    'receipt_80mm': InvoiceTemplate('receipt_80mm', 80 * mm, None, margin=4 * mm, logo_size=50,
+                                    title_size=10, text_size=8, padding=2, qr_size=90,
+                                    receipt=True),
+}
+# Chosen per terminal, e.g. receipt_80mm on a counter with a thermal printer
+DEFAULT_TEMPLATE = os.environ.get('NOOR_INVOICE_TEMPLATE', 'a4')
+
+
+@lru_cache(maxsize=1)
+def _logo_source() -> PILImage.Image:
+    """The logo reduced to the largest size any template draws.
+
+    The bundled PNG is thousands of pixels wide; decoding and embedding it
+    at full size took seconds per invoice.
+    """
+    pixels = int(max(template.logo_size for template in TEMPLATES.values()) * LOGO_SCALE)
+    with PILImage.open(LOGO_PATH) as source:
+        source.thumbnail((pixels, pixels), PILImage.LANCZOS)
+        return source.copy()
+
+
+@lru_cache(maxsize=None)
+def _logo_png(size: float) -> bytes:
+    pixels = max(1, int(size * LOGO_SCALE))
+    logo = _logo_source().resize((pixels, pixels), PILImage.LANCZOS)
+    buffer = io.BytesIO()
+    logo.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class PreparedTemplate:
+    """A template's static parts, built once per process and reused by every invoice.
+
+    Styles and the fixed header text are shared as they are. Flowables keep
+    layout state from the document they were drawn in, so logo() hands out
+    a new one over the cached image data each time.
+    """
+
+    def __init__(self, template: InvoiceTemplate):
+        self.template = template
+        self.width = template.page_width - 2 * template.margin
+        self.regular = font_name(INVOICE_FONT_FAMILY)
+        self.bold = font_name(INVOICE_FONT_FAMILY, 'Bold')
+        self._logo = _logo_png(template.logo_size)
+
+        self.title = shape('فاتورة ضريبية مبسطة')
+        self.seller = shape(SELLER_NAME)
+        self.tax_number = shape(f'الرقم الضريبي: {TAX_NUMBER}')
+        self.customer_title = shape('بيانات العميل')
+        self.cash_customer = shape('عميل نقدي')
+        self.footer = shape(f'شكراً لتعاملكم معنا - {SELLER_NAME}')
+        if template.receipt:
+            self.item_headings = shape_many(['الإجمالي', 'السعر', 'الكمية', 'الصنف'])
+            # Fixed columns grow with the text; the item name takes the rest
+            fixed = [int(template.text_size * k) for k in (6, 5.5, 3.5)]
+        else:
+            self.item_headings = shape_many(['الإجمالي', 'السعر', 'الكمية', 'الصنف', 'م'])
+            fixed = [int(template.text_size * k) for k in (70 / 12, 70 / 12, 60 / 12)]
+            fixed.append(int(template.text_size * 30 / 12))
+        self.item_widths = fixed[:3] + [self.width - sum(fixed)] + fixed[3:]
+        # Room left for the item name inside its cell
+        self.name_width = self.item_widths[3] - 2 * template.padding
+
+        self.logo_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER' if template.receipt else 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+        self.header_style = self._header_style()
+        self.customer_style = self._customer_style()
+        self.items_style = self._items_style()
+        self.qr_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+        self.footer_style = ParagraphStyle(
+            f'footer_{template.name}',
+            fontName=self.regular,
+            fontSize=template.text_size,
+            leading=template.text_size * 1.2,
+            alignment=1 if template.receipt else 2,
+            textColor=colors.black,
+        )
+
+    def logo(self) -> Image:
+        size = self.template.logo_size
+        return Image(io.BytesIO(self._logo), width=size, height=size)
+
+    def _header_style(self) -> TableStyle:
+        template = self.template
+        if template.receipt:
+            return TableStyle([
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONT', (0, 0), (-1, 0), self.bold),
+                ('FONT', (0, 1), (-1, -1), self.regular),
+                ('FONTSIZE', (0, 0), (-1, 0), template.title_size),
+                ('FONTSIZE', (0, 1), (-1, -1), template.text_size),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+                ('LINEBELOW', (0, -1), (-1, -1), 0.5, colors.grey),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), template.padding),
+                ('TOPPADDING', (0, 0), (-1, -1), template.padding),
+            ])
+        return TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('FONT', (0, 0), (-1, -1), self.bold),
+            ('FONTSIZE', (0, 0), (-1, -1), template.title_size),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.Color(0.95, 0.95, 0.95)),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), template.padding),
+            ('TOPPADDING', (0, 0), (-1, -1), template.padding),
+            ('RIGHTPADDING', (0, 0), (-1, -1), template.padding + 2),
+            ('LEFTPADDING', (0, 0), (-1, -1), template.padding + 2),
+        ])
+
+    def _customer_style(self) -> TableStyle:
+        template = self.template
+        if template.receipt:
+            return TableStyle([
+                ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+                ('FONT', (0, 0), (-1, -1), self.regular),
+                ('FONTSIZE', (0, 0), (-1, -1), template.text_size),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), template.padding),
+                ('TOPPADDING', (0, 0), (-1, -1), template.padding),
+            ])
+        return TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('FONT', (0, 0), (0, 0), self.bold),
+            ('FONT', (0, 1), (-1, -1), self.regular),
+            ('FONTSIZE', (0, 0), (0, 0), template.title_size),
+            ('FONTSIZE', (0, 1), (-1, -1), template.text_size),
+            ('BACKGROUND', (0, 0), (0, 0), colors.Color(0.9, 0.9, 0.9)),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), template.padding),
+            ('TOPPADDING', (0, 0), (-1, -1), template.padding),
+            ('RIGHTPADDING', (0, 0), (-1, -1), template.padding * 2),
+        ])
+
+    def _items_style(self) -> TableStyle:
+        template = self.template
+        commands = [
+            ('ALIGN', (0, 0), (-2, -1), 'CENTER'),
+            ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONT', (0, 0), (-1, 0), self.bold),
+            ('FONT', (0, 1), (-1, -1), self.regular),
+            ('FONTSIZE', (0, 0), (-1, -1), template.text_size),
+            ('LEADING', (0, 0), (-1, -1), template.text_size * 1.2),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), template.padding),
+            ('TOPPADDING', (0, 0), (-1, -1), template.padding),
+        ]
+        if template.receipt:
+            commands += [
+                ('LEFTPADDING', (0, 0), (-1, -1), template.padding),
+                ('RIGHTPADDING', (0, 0), (-1, -1), template.padding),
+                ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.grey),
+            ]
+        else:
+            commands += [
+                ('GRID', (0, 0), (-1, -2), 0.5, colors.grey),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),
+            ]
+        return TableStyle(commands)
+
+
+@lru_cache(maxsize=None)
+def prepare_template(name: Optional[str] = None) -> PreparedTemplate:
+    """Prepared template by name, DEFAULT_TEMPLATE when None; raises KeyError for unknown names"""
+    return PreparedTemplate(TEMPLATES[name or DEFAULT_TEMPLATE])
+
+
+def warm_up(template_names: Iterable[Optional[str]] = (None,)):
+    """Prepare templates ahead of the first invoice, e.g. in a worker process initializer"""
+    for name in template_names:
+        prepare_template(name)
+
+
+if __name__ == '__main__':
+    # Benchmark: python invoice_templates.py [invoices per template]
+    import sys
+    import tempfile
+    import time
+
+    from invoice_renderer import InvoiceCustomer, InvoiceLine, InvoiceSnapshot, render_invoice
+    # The renderer caches in the imported module, not in this __main__ copy
+    from invoice_templates import prepare_template
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    lines = tuple(InvoiceLine(f'صنف تجريبي رقم {i} بوصف طويل نسبياً', i % 5 + 1, 12.5 * i,
+                              12.5 * i * (i % 5 + 1)) for i in range(1, 16))
+    subtotal = sum(line.total for line in lines)
+    invoice = InvoiceSnapshot(
+        order_id=1, issued_at='2024-01-01 12:00:00',
+        customer=InvoiceCustomer('عميل تجريبي', 'القاهرة', '0100000000'), lines=lines,
+        subtotal=subtotal, discount=10.0, net=subtotal - 10, vat_enabled=True, vat_percent=14,
+        vat=(subtotal - 10) * 0.14, total=(subtotal - 10) * 1.14)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in TEMPLATES:
+            started = time.perf_counter()
+            prepare_template(name)
+            prepared_ms = (time.perf_counter() - started) * 1000
+            times = []
+            for i in range(count):
+                started = time.perf_counter()
+                render_invoice(invoice, os.path.join(directory, f'{name}_{i}.pdf'), name)
+                times.append((time.perf_counter() - started) * 1000)
+            print(f"{name:14} prepare {prepared_ms:8.1f} ms   first {times[0]:7.1f} ms   "
+                  f"mean {sum(times) / len(times):7.1f} ms   min {min(times):7.1f} ms")
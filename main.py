@@ -5,10 +5,17 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                            QFrame, QGraphicsDropShadowEffect, QHBoxLayout, QProgressBar,
                            QDialog, QMessageBox, QSizePolicy)
 from PyQt6.QtCore import Qt, QTimer, QSize
-from PyQt6.QtGui import QPixmap, QIcon, QColor, QFont
+from PyQt6.QtGui import QPixmap, QIcon, QColor, QFont, QShortcut, QKeySequence
 from suppliers_ui import SuppliersWidget
 from products_ui import ProductsWidget
 from sales_ui import SalesWindow as NewSaleWidget
+from diagnostics_ui import QueryDiagnosticsDialog
+from connection_pool import close_all_pools
+from db_worker import shutdown_executor
+from checkout_queue import shutdown_checkout_queues
+from invoice_service import shutdown_invoice_service
+from database import initialize_database
+from user_management import verify_user
 import sqlite3
 
 class SplashScreen(QWidget):
@@ -371,21 +378,16 @@ class LoginWindow(QWidget):
             return
         
         try:
-            conn = sqlite3.connect('noor_alislam.db')
-            cursor = conn.cursor()
+            # كلمات المرور محفوظة بتشفير bcrypt في password_hash فقط
+            valid, user_type = verify_user(username, password)
             
-            cursor.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
-            user = cursor.fetchone()
-            
-            if user:
+            if valid:
                 self.dashboard = Dashboard()
                 self.dashboard.show()
                 self.close()
             else:
                 QMessageBox.warning(self, "خطأ", "اسم المستخدم أو كلمة المرور غير صحيحة")
             
-            conn.close()
-            
         except sqlite3.Error as e:
             QMessageBox.critical(self, "خطأ", f"خطأ في قاعدة البيانات: {str(e)}")
 
@@ -694,6 +696,10 @@ class Dashboard(QMainWindow):
         refresh_btn.clicked.connect(self.refresh_all_data)
         top_layout.addWidget(refresh_btn)
 
+        # اختصار مخفي لنافذة تشخيص الاستعلامات
+        diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        diagnostics_shortcut.activated.connect(self.show_diagnostics_dialog)
+
     def center_window(self):
         frame_geometry = self.frameGeometry()
         screen_center = QApplication.primaryScreen().availableGeometry().center()
@@ -705,10 +711,25 @@ class Dashboard(QMainWindow):
         login_window.show()
         self.close()
 
+    def closeEvent(self, event):
+        # إيقاف مؤقتات الشاشات أولاً: النافذة لا تُحذف عند تسجيل الخروج
+        if hasattr(self, 'sales_page'):
+            self.sales_page.stop_background_work()
+        # حفظ الطلبات المعلقة وإيقاف استعلامات الخلفية ثم إغلاق اتصالات قاعدة البيانات
+        shutdown_checkout_queues()
+        shutdown_invoice_service()
+        shutdown_executor()
+        close_all_pools()
+        super().closeEvent(event)
+
     def show_about_dialog(self):
         dialog = AboutDialog(self)
         dialog.exec()
 
+    def show_diagnostics_dialog(self):
+        dialog = QueryDiagnosticsDialog(self)
+        dialog.exec()
+
     def change_page(self, clicked_button, index):
         self.stacked_widget.setCurrentIndex(index)
         # Update button states
@@ -720,8 +741,9 @@ class Dashboard(QMainWindow):
     def refresh_all_data(self):
         """تحديث جميع البيانات في كل الواجهات"""
         try:
-            # تحديث واجهة المبيعات
+            # تحديث واجهة المبيعات بعد استبدال أي اتصال معطل بقاعدة البيانات
             if hasattr(self, 'sales_page'):
+                self.sales_page.db_manager.pool.health_check()
                 self.sales_page.refresh_data()
             
             # تحديث واجهة المنتجات
@@ -814,7 +836,7 @@ class MainWindow(QMainWindow):
 
 def main():
     # Initialize database
-    # initialize_database()
+    initialize_database()
     
     # Create and run application
     app = QApplication(sys.argv)
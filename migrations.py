@@ -0,0 +1,429 @@
+import sqlite3
+import bcrypt
+from typing import Callable, List, Tuple
+
+# Ordered schema migrations, tracked through PRAGMA user_version.
+# Each entry is (version, description, apply(cursor)).
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+
+def migration(version: int, description: str):
+    """Register a migration step; versions must be added in increasing order"""
+    def register(func):
+        if MIGRATIONS and MIGRATIONS[-1][0] >= version:
+            raise ValueError(f"Migration {version} registered out of order")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply every pending migration, each in its own transaction"""
+    current = get_schema_version(conn)
+    for version, description, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            apply(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            raise sqlite3.DatabaseError(
+                f"Migration {version} ({description}) failed: {e}") from e
+        print(f"Applied migration {version}: {description}")
+        current = version
+    return current
+
+
+@migration(1, "Align columns that drifted from create_tables")
+def _align_legacy_columns(cursor):
+    # Older databases store the customer discount as an amount
+    if not column_exists(cursor, 'customers', 'discount_amount'):
+        cursor.execute("ALTER TABLE customers ADD COLUMN discount_amount DECIMAL(10, 2) DEFAULT 0")
+        if column_exists(cursor, 'customers', 'discount_percentage'):
+            cursor.execute("UPDATE customers SET discount_amount = discount_percentage")
+
+
+PERFORMANCE_INDEXES = [
+    ('idx_order_details_product_price_type', 'order_details(product_id, price_type)'),
+    ('idx_order_details_order', 'order_details(order_id)'),
+    ('idx_warehouse_products_product', 'warehouse_products(product_id)'),
+    ('idx_stock_alerts_product', 'stock_alerts(product_id)'),
+    ('idx_orders_date', 'orders(order_date)'),
+    ('idx_invoices_date', 'invoices(invoice_date)'),
+    ('idx_supplier_products_product', 'supplier_products(product_id)'),
+]
+
+
+@migration(2, "Add indexes for the hot sales and catalog queries")
+def _add_performance_indexes(cursor):
+    # executescript() would commit early, so run each statement separately
+    for name, target in PERFORMANCE_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+@migration(3, "Move product sale prices out of order_details")
+def _create_product_prices(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_prices (
+            price_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            price_type TEXT NOT NULL,
+            price DECIMAL(10, 2) NOT NULL,
+            effective_from TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            effective_to TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products(product_id)
+        )
+    """)
+    # Only one open (current) price per product and price type
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_product_prices_current
+            ON product_prices(product_id, price_type) WHERE effective_to IS NULL
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_product_prices_history
+            ON product_prices(product_id, price_type, effective_from)
+    """)
+
+    # Prices used to be stored as order_details rows without an order.
+    # The newest row per product and type is the current price.
+    cursor.execute("""
+        INSERT INTO product_prices (product_id, price_type, price, effective_to)
+        SELECT od.product_id, od.price_type, od.sale_price,
+               CASE WHEN od.order_detail_id = (
+                   SELECT MAX(latest.order_detail_id)
+                   FROM order_details latest
+                   WHERE latest.order_id IS NULL
+                   AND latest.product_id = od.product_id
+                   AND latest.price_type = od.price_type
+               ) THEN NULL ELSE CURRENT_TIMESTAMP END
+        FROM order_details od
+        WHERE od.order_id IS NULL
+        AND od.price_type IN ('wholesale', 'retail')
+        AND od.sale_price IS NOT NULL
+        ORDER BY od.order_detail_id
+    """)
+    cursor.execute("""
+        DELETE FROM order_details
+        WHERE order_id IS NULL AND price_type IN ('wholesale', 'retail')
+    """)
+
+
+# product_catalog is a flat, denormalised copy of get_products_with_details,
+# one row per product and warehouse (warehouse_id 0 = not stocked anywhere).
+# Triggers on the source tables rebuild the rows of the affected product.
+CATALOG_COLUMNS = """
+    product_id, warehouse_id, product_name, description, unit_type,
+    min_stock_level, current_stock, warehouse_name, min_supply_price,
+    suppliers, wholesale_price, retail_price
+"""
+
+
+def catalog_select_sql(product_filter: str) -> str:
+    """SELECT producing the product_catalog rows for the filtered products"""
+    return f"""
+        SELECT
+            p.product_id,
+            COALESCE(wp.warehouse_id, 0),
+            p.product_name,
+            p.description,
+            p.unit_type,
+            p.min_stock_level,
+            COALESCE(wp.quantity, 0),
+            w.warehouse_name,
+            (SELECT MIN(sp.supply_price) FROM supplier_products sp
+             WHERE sp.product_id = p.product_id),
+            (SELECT GROUP_CONCAT(DISTINCT s.supplier_name)
+             FROM supplier_products sp
+             JOIN suppliers s ON sp.supplier_id = s.supplier_id
+             WHERE sp.product_id = p.product_id),
+            (SELECT pp.price FROM product_prices pp
+             WHERE pp.product_id = p.product_id
+             AND pp.price_type = 'wholesale' AND pp.effective_to IS NULL),
+            (SELECT pp.price FROM product_prices pp
+             WHERE pp.product_id = p.product_id
+             AND pp.price_type = 'retail' AND pp.effective_to IS NULL)
+        FROM products p
+        LEFT JOIN warehouse_products wp ON wp.product_id = p.product_id
+        LEFT JOIN warehouses w ON w.warehouse_id = wp.warehouse_id
+        WHERE {product_filter}
+    """
+
+
+def _catalog_refresh_sql(product_expr: str) -> str:
+    return f"""
+        DELETE FROM product_catalog WHERE product_id = {product_expr};
+        INSERT INTO product_catalog ({CATALOG_COLUMNS})
+        {catalog_select_sql(f'p.product_id = {product_expr}')};
+    """
+
+
+def _catalog_suppliers_sql(supplier_expr: str) -> str:
+    return f"""
+        UPDATE product_catalog
+        SET min_supply_price = (
+                SELECT MIN(sp.supply_price) FROM supplier_products sp
+                WHERE sp.product_id = product_catalog.product_id),
+            suppliers = (
+                SELECT GROUP_CONCAT(DISTINCT s.supplier_name)
+                FROM supplier_products sp
+                JOIN suppliers s ON sp.supplier_id = s.supplier_id
+                WHERE sp.product_id = product_catalog.product_id)
+        WHERE product_id IN (
+            SELECT product_id FROM supplier_products WHERE supplier_id = {supplier_expr});
+    """
+
+
+def catalog_triggers():
+    """(name, event, body) for every trigger keeping product_catalog current"""
+    triggers = [
+        ('trg_catalog_products_insert', 'AFTER INSERT ON products',
+         _catalog_refresh_sql('NEW.product_id')),
+        # The catalog's stock comes from warehouse_products, so the products.current_stock
+        # decrement in every sale must not rebuild the product's rows
+        ('trg_catalog_products_update',
+         'AFTER UPDATE OF product_name, description, unit_type, min_stock_level ON products',
+         _catalog_refresh_sql('NEW.product_id')),
+        ('trg_catalog_products_delete', 'AFTER DELETE ON products',
+         "DELETE FROM product_catalog WHERE product_id = OLD.product_id;"),
+        ('trg_catalog_warehouses_update', 'AFTER UPDATE OF warehouse_name ON warehouses',
+         """UPDATE product_catalog SET warehouse_name = NEW.warehouse_name
+            WHERE warehouse_id = NEW.warehouse_id;"""),
+        ('trg_catalog_warehouses_delete', 'AFTER DELETE ON warehouses',
+         """UPDATE product_catalog SET warehouse_name = NULL
+            WHERE warehouse_id = OLD.warehouse_id;"""),
+        ('trg_catalog_suppliers_update', 'AFTER UPDATE OF supplier_name ON suppliers',
+         _catalog_suppliers_sql('NEW.supplier_id')),
+    ]
+    for table in ('warehouse_products', 'supplier_products', 'product_prices'):
+        triggers += [
+            (f'trg_catalog_{table}_insert', f'AFTER INSERT ON {table}',
+             _catalog_refresh_sql('NEW.product_id')),
+            (f'trg_catalog_{table}_update', f'AFTER UPDATE ON {table}',
+             _catalog_refresh_sql('NEW.product_id')),
+            (f'trg_catalog_{table}_delete', f'AFTER DELETE ON {table}',
+             _catalog_refresh_sql('OLD.product_id')),
+        ]
+    return triggers
+
+
+def create_catalog_triggers(cursor):
+    for name, event, body in catalog_triggers():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+
+def rebuild_product_catalog(cursor):
+    cursor.execute("DELETE FROM product_catalog")
+    cursor.execute(f"""
+        INSERT INTO product_catalog ({CATALOG_COLUMNS})
+        {catalog_select_sql('1 = 1')}
+    """)
+
+
+@migration(4, "Add the trigger-maintained product_catalog summary table")
+def _create_product_catalog(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_catalog (
+            product_id INTEGER NOT NULL,
+            warehouse_id INTEGER NOT NULL DEFAULT 0,
+            product_name TEXT NOT NULL,
+            description TEXT,
+            unit_type TEXT,
+            min_stock_level INTEGER,
+            current_stock INTEGER DEFAULT 0,
+            warehouse_name TEXT,
+            min_supply_price DECIMAL(10, 2),
+            suppliers TEXT,
+            wholesale_price DECIMAL(10, 2),
+            retail_price DECIMAL(10, 2),
+            PRIMARY KEY (product_id, warehouse_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_product_catalog_name
+            ON product_catalog(product_name, product_id, warehouse_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_product_catalog_warehouse
+            ON product_catalog(warehouse_id)
+    """)
+    create_catalog_triggers(cursor)
+    rebuild_product_catalog(cursor)
+
+
+@migration(5, "Add keyset pagination indexes for customers and suppliers")
+def _add_pagination_indexes(cursor):
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_name
+            ON customers(customer_name, customer_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_suppliers_name
+            ON suppliers(supplier_name, supplier_id)
+    """)
+
+
+# products_fts holds normalised copies of the searchable product fields,
+# keyed by rowid = product_id. arabic_normalize() is registered on every
+# connection by arabic_search.register_functions().
+# Migrations pass the codes expression matching the products columns that
+# exist at their version.
+FTS_CODES_EXPR = "CAST({row}.product_id AS TEXT)"
+FTS_CODES_WITH_BARCODE_EXPR = "{row}.product_id || ' ' || COALESCE({row}.barcode, '')"
+
+
+def _fts_insert_sql(row: str, codes_expr: str) -> str:
+    return f"""
+        INSERT INTO products_fts (rowid, product_name, description, codes)
+        VALUES ({row}.product_id, arabic_normalize({row}.product_name),
+                arabic_normalize({row}.description), {codes_expr.format(row=row)});
+    """
+
+
+def create_search_triggers(cursor, codes_expr: str = FTS_CODES_WITH_BARCODE_EXPR):
+    columns = 'product_name, description'
+    if 'barcode' in codes_expr:
+        columns += ', barcode'
+    triggers = [
+        ('trg_fts_products_insert', 'AFTER INSERT ON products',
+         _fts_insert_sql('NEW', codes_expr)),
+        # Only the indexed columns: stock updates on every sale must not touch the index
+        ('trg_fts_products_update', f'AFTER UPDATE OF {columns} ON products',
+         "DELETE FROM products_fts WHERE rowid = OLD.product_id;" + _fts_insert_sql('NEW', codes_expr)),
+        ('trg_fts_products_delete', 'AFTER DELETE ON products',
+         "DELETE FROM products_fts WHERE rowid = OLD.product_id;"),
+    ]
+    for name, event, body in triggers:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+
+def rebuild_search_index(cursor, codes_expr: str = FTS_CODES_WITH_BARCODE_EXPR):
+    cursor.execute("DELETE FROM products_fts")
+    cursor.execute(f"""
+        INSERT INTO products_fts (rowid, product_name, description, codes)
+        SELECT p.product_id, arabic_normalize(p.product_name),
+               arabic_normalize(p.description), {codes_expr.format(row='p')}
+        FROM products p
+    """)
+
+
+@migration(6, "Add the FTS5 product search index")
+def _create_product_search(cursor):
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            product_name, description, codes,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        )
+    """)
+    create_search_triggers(cursor, FTS_CODES_EXPR)
+    rebuild_search_index(cursor, FTS_CODES_EXPR)
+
+
+@migration(7, "Add product barcodes")
+def _add_product_barcodes(cursor):
+    if not column_exists(cursor, 'products', 'barcode'):
+        cursor.execute("ALTER TABLE products ADD COLUMN barcode TEXT")
+    # Many products have no barcode yet, so only non-NULL values must be unique
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_products_barcode
+        ON products(barcode) WHERE barcode IS NOT NULL
+    """)
+    create_search_triggers(cursor)
+    rebuild_search_index(cursor)
+
+
+@migration(8, "Add checkout ids so queued orders commit exactly once")
+def _add_order_checkout_ids(cursor):
+    if not column_exists(cursor, 'orders', 'checkout_id'):
+        cursor.execute("ALTER TABLE orders ADD COLUMN checkout_id TEXT")
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_checkout_id
+        ON orders(checkout_id) WHERE checkout_id IS NOT NULL
+    """)
+
+
+@migration(9, "Log product_catalog changes for targeted screen refreshes")
+def _add_catalog_changes(cursor):
+    # Every catalog rewrite goes through product_catalog, so logging its rows
+    # covers stock, price, supplier and product edits alike
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_changes (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL
+        )
+    """)
+    for name, event, row in (
+            ('trg_catalog_changes_insert', 'AFTER INSERT ON product_catalog', 'NEW'),
+            ('trg_catalog_changes_update', 'AFTER UPDATE ON product_catalog', 'NEW'),
+            ('trg_catalog_changes_delete', 'AFTER DELETE ON product_catalog', 'OLD')):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"""
+            CREATE TRIGGER {name} {event} BEGIN
+                INSERT INTO catalog_changes (product_id) VALUES ({row}.product_id);
+            END
+        """)
+
+
+@migration(10, "Store invoice print details so saved invoices can be reprinted")
+def _add_invoice_print_details(cursor):
+    # invoice_date has no time and VAT was never saved, so a reprint could not
+    # show the totals or the QR code of the original
+    for column, definition in (('issued_at', 'TEXT'),
+                               ('vat_percent', 'REAL NOT NULL DEFAULT 0'),
+                               ('vat_amount', 'DECIMAL(10, 2) NOT NULL DEFAULT 0')):
+        if not column_exists(cursor, 'invoices', column):
+            cursor.execute(f"ALTER TABLE invoices ADD COLUMN {column} {definition}")
+
+
+@migration(11, "Limit the product search trigger to the indexed columns")
+def _narrow_search_update_trigger(cursor):
+    create_search_triggers(cursor)
+
+
+@migration(12, "Limit the product_catalog products trigger to the copied columns")
+def _narrow_catalog_products_trigger(cursor):
+    create_catalog_triggers(cursor)
+
+
+@migration(13, "Keep user passwords only as bcrypt hashes in password_hash")
+def _hash_legacy_passwords(cursor):
+    # Older databases keep plain-text passwords in a NOT NULL password column
+    # that user_management never writes, so adding a user failed there.
+    # SQLite cannot drop the constraint in place, so the table is rebuilt.
+    if not column_exists(cursor, 'users', 'password'):
+        return
+    hash_column = 'password_hash' if column_exists(cursor, 'users', 'password_hash') else 'NULL'
+    cursor.execute(f"SELECT user_id, username, password, {hash_column}, user_type FROM users")
+    users = [(user_id, username,
+              password_hash or bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()),
+              user_type)
+             for user_id, username, password, password_hash, user_type in cursor.fetchall()]
+    cursor.execute("""
+        CREATE TABLE users_new (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            user_type TEXT
+        )
+    """)
+    cursor.executemany("""
+        INSERT INTO users_new (user_id, username, password_hash, user_type)
+        VALUES (?, ?, ?, ?)
+    """, users)
+    cursor.execute("DROP TABLE users")
+    cursor.execute("ALTER TABLE users_new RENAME TO users")
@@ -0,0 +1,161 @@
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional, Sequence, Set
+
+from arabic_search import normalize_arabic
+
+# Per-keystroke budget: searching plus redrawing should fit in one frame at 60Hz
+FRAME_BUDGET_MS = 16.0
+SEARCH_LATENCY_LOG = os.path.join('logs', 'search_latency.log')
+# Terms up to this length are looked up by word prefix, longer ones by trigrams
+PREFIX_LEN = 2
+
+_latency_logger = logging.getLogger('noor.search_latency')
+_latency_logger.propagate = False
+
+
+def _trigrams(word: str) -> List[str]:
+    return [word[i:i + 3] for i in range(len(word) - 2)]
+
+
+def _words(product, barcode: Optional[str]) -> List[str]:
+    return normalize_arabic(f"{product.product_name} {product.product_id} {barcode or ''}").split()
+
+
+class SearchLatency:
+    """Running per-keystroke latency figures for the diagnostics dialog"""
+    __slots__ = ('count', 'total_ms', 'max_ms', 'over_budget', 'last_ms')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.over_budget = 0
+        self.last_ms = 0.0
+
+    def record(self, query: str, elapsed_ms: float, results: int):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_ms = elapsed_ms
+        if elapsed_ms > FRAME_BUDGET_MS:
+            self.over_budget += 1
+            # Searches within budget only feed the figures above
+            _log_latency(query, elapsed_ms, results)
+
+
+latency = SearchLatency()
+
+
+def _log_latency(query: str, elapsed_ms: float, results: int):
+    if not _latency_logger.handlers:
+        os.makedirs(os.path.dirname(SEARCH_LATENCY_LOG), exist_ok=True)
+        handler = RotatingFileHandler(SEARCH_LATENCY_LOG, maxBytes=1024 * 1024,
+                                      backupCount=3, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        _latency_logger.addHandler(handler)
+        _latency_logger.setLevel(logging.INFO)
+    _latency_logger.warning(f"{elapsed_ms:.2f}ms budget={FRAME_BUDGET_MS:g}ms "
+                            f"results={results} query_len={len(query)}")
+
+
+class ProductSearchIndex:
+    """In-memory word-prefix search over normalised product names, codes and barcodes.
+
+    A query matches a product when every query term starts one of its words.
+    Short terms come straight from a prefix index; longer terms intersect the
+    trigram index and are then verified. A query that extends the previous one
+    only re-checks the previous matches.
+    """
+
+    def __init__(self, products: Sequence, barcodes: Optional[Dict[int, str]] = None):
+        self.products = list(products)
+        barcodes = barcodes or {}
+        # Exact barcode -> catalog rows for the scanner
+        self._by_barcode: Dict[str, List[int]] = {}
+        # ' word1 word2 ...': a term starts a word iff ' ' + term occurs in it
+        self._texts: List[str] = []
+        self._prefixes: Dict[str, Set[int]] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+        for index, product in enumerate(self.products):
+            barcode = barcodes.get(product.product_id)
+            if barcode:
+                self._by_barcode.setdefault(barcode, []).append(index)
+            words = _words(product, barcode)
+            self._texts.append(' ' + ' '.join(words))
+            for word in words:
+                for length in range(1, min(PREFIX_LEN, len(word)) + 1):
+                    self._prefixes.setdefault(word[:length], set()).add(index)
+                for gram in _trigrams(word):
+                    self._trigrams.setdefault(gram, set()).add(index)
+        self._last_query: Optional[str] = None
+        self._last_terms: List[str] = []
+        self._last_matches: List[int] = []
+
+    def __len__(self):
+        return len(self.products)
+
+    def update_product(self, index: int, product, barcode: Optional[str]) -> bool:
+        """Swap in a re-read row; False if its searchable text changed and the index must be rebuilt"""
+        if ' ' + ' '.join(_words(product, barcode)) != self._texts[index]:
+            return False
+        self.products[index] = product
+        return True
+
+    def lookup_barcode(self, barcode: str) -> List[int]:
+        """Rows of the product with exactly this barcode"""
+        return self._by_barcode.get(barcode.strip(), [])
+
+    def search(self, query: str) -> List:
+        """Products matching query, in catalog order"""
+        return [self.products[index] for index in self.search_rows(query)]
+
+    def search_rows(self, query: str) -> List[int]:
+        """Positions in self.products of the products matching query"""
+        normalized = normalize_arabic(query)
+        terms = normalized.split()
+        if not terms:
+            self._last_query, self._last_terms, self._last_matches = None, [], []
+            return list(range(len(self.products)))
+
+        if self._last_query is not None and normalized.startswith(self._last_query):
+            # Narrowing: every match of the longer query matched the shorter one,
+            # and only the last old term and any new terms can have changed
+            candidates = self._last_matches
+            check = terms[max(len(self._last_terms) - 1, 0):]
+        else:
+            candidates = sorted(self._candidates(terms))
+            # Prefix-index hits are exact; only trigram hits need verifying
+            check = [term for term in terms if len(term) > PREFIX_LEN]
+
+        needles = [' ' + term for term in check]
+        texts = self._texts
+        matches = [index for index in candidates
+                   if all(needle in texts[index] for needle in needles)]
+        self._last_query, self._last_terms, self._last_matches = normalized, terms, matches
+        return matches
+
+    def _candidates(self, terms: List[str]) -> Set[int]:
+        result: Optional[Set[int]] = None
+        # Most selective (longest) terms first so the intersection shrinks fast
+        for term in sorted(terms, key=len, reverse=True):
+            if len(term) <= PREFIX_LEN:
+                ids = self._prefixes.get(term, set())
+            else:
+                grams = _trigrams(term)
+                ids = set.intersection(*(self._trigrams.get(gram, set()) for gram in grams))
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result
+
+
+def timed_search(index: ProductSearchIndex, query: str, render) -> List[int]:
+    """Search, hand the matching rows to render(), and record the keystroke latency"""
+    start = time.perf_counter()
+    results = index.search_rows(query)
+    render(results)
+    latency.record(query, (time.perf_counter() - start) * 1000, len(results))
+    return results
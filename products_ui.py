@@ -3,7 +3,10 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
                                QDialog, QMessageBox, QComboBox, QSpinBox, QDoubleSpinBox,
                                QTextEdit, QSplitter, QGroupBox, QAbstractItemView)
 from PyQt6.QtCore import Qt
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, COUNT_ESTIMATE_CAP
+from db_worker import get_executor
+
+PAGE_SIZE = 100
 
 class AddEditProductDialog(QDialog):
     def __init__(self, parent=None, db_manager=None, product_data=None):
@@ -29,13 +32,23 @@ class AddEditProductDialog(QDialog):
         name_layout.addWidget(self.name_input)
         layout.addLayout(name_layout)
 
+        # Barcode
+        barcode_layout = QHBoxLayout()
+        barcode_label = QLabel("الباركود:")
+        self.barcode_input = QLineEdit()
+        if self.product_data:
+            self.barcode_input.setText(self.db_manager.get_product_barcode(self.product_data[0]) or "")
+        barcode_layout.addWidget(barcode_label)
+        barcode_layout.addWidget(self.barcode_input)
+        layout.addLayout(barcode_layout)
+
         # Description
         desc_layout = QVBoxLayout()
         desc_label = QLabel("وصف المنتج:")
         self.desc_input = QTextEdit()
         self.desc_input.setMaximumHeight(100)
         if self.product_data:
-            self.desc_input.setText(self.product_data[2])
+            self.desc_input.setText(self.product_data[2] or "")
         desc_layout.addWidget(desc_label)
         desc_layout.addWidget(self.desc_input)
         layout.addLayout(desc_layout)
@@ -46,7 +59,7 @@ class AddEditProductDialog(QDialog):
         self.unit_combo = QComboBox()
         self.unit_combo.addItems(["قطعة", "متر", "كيلو"])
         if self.product_data:
-            self.unit_combo.setCurrentText(self.product_data[3])
+            self.unit_combo.setCurrentText(self.product_data[3] or "")
         unit_layout.addWidget(unit_label)
         unit_layout.addWidget(self.unit_combo)
         layout.addLayout(unit_layout)
@@ -190,6 +203,16 @@ class AddEditProductDialog(QDialog):
             }
         """)
 
+    def accept(self):
+        # الباركود يجب أن يكون فريداً لكل منتج
+        barcode = self.barcode_input.text().strip()
+        if barcode:
+            owner = self.db_manager.get_product_id_by_barcode(barcode)
+            if owner is not None and (not self.product_data or owner != self.product_data[0]):
+                QMessageBox.warning(self, "تنبيه", "هذا الباركود مستخدم لمنتج آخر")
+                return
+        super().accept()
+
     def load_warehouses(self):
         warehouses = self.db_manager.get_warehouses()
         for warehouse_id, warehouse_name in warehouses:
@@ -248,6 +271,7 @@ class AddEditProductDialog(QDialog):
 
         return {
             'name': self.name_input.text(),
+            'barcode': self.barcode_input.text().strip(),
             'description': self.desc_input.toPlainText(),
             'unit_type': self.unit_combo.currentText(),
             'min_stock': self.min_stock_input.value(),
@@ -429,38 +453,8 @@ class UpdateStockDialog(QDialog):
         """
         حفظ التغييرات في قاعدة البيانات
         """
-        updates = self.get_data()
-        total_new_stock = sum(update['quantity'] for update in updates)
-        
-        # Update database
-        success = True
-        try:
-            # Start transaction
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("BEGIN TRANSACTION")
-            
-            # Update product's total stock
-            cursor.execute("""
-                UPDATE products 
-                SET current_stock = ? 
-                WHERE product_id = ?
-            """, (total_new_stock, self.product_id))
-            
-            # Update warehouse quantities
-            for update in updates:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO warehouse_products 
-                    (warehouse_id, product_id, quantity) 
-                    VALUES (?, ?, ?)
-                """, (update['warehouse_id'], self.product_id, update['quantity']))
-            
-            conn.commit()
-            
-        except Exception as e:
-            conn.rollback()
-            success = False
-            print(f"Error updating stock: {e}")
+        # يحدّث قاعدة البيانات ولقطة المخزون المشتركة معاً
+        success = self.db_manager.update_product_warehouse(self.product_id, self.get_data())
         
         if success:
             self.accept()
@@ -470,7 +464,12 @@ class UpdateStockDialog(QDialog):
 class ProductsWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.db_manager = DatabaseManager()
+        # شاشة إدارية تقرأ الكتالوج كاملاً؛ اتصالاتها منفصلة عن اتصالات شاشة البيع
+        self.db_manager = DatabaseManager(profile='reporting')
+        self.products = []
+        self.total_products = 0
+        self.next_cursor = None
+        self.page_loading = False
         self.setup_ui()
         self.load_products()
 
@@ -510,6 +509,27 @@ class ProductsWidget(QWidget):
         
         layout.addLayout(buttons_layout)
 
+        # Search
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("بحث عن منتج...")
+        self.search_input.textChanged.connect(self.load_products)
+        self.search_input.setStyleSheet("""
+            QLineEdit {
+                padding: 8px;
+                background-color: rgba(10, 17, 40, 0.95);
+                color: #c5a572;
+                border: 1px solid #c5a572;
+                border-radius: 5px;
+                font-size: 14px;
+            }
+        """)
+        search_layout.addWidget(self.search_input)
+        self.count_label = QLabel()
+        self.count_label.setStyleSheet("color: #c5a572; font-size: 14px;")
+        search_layout.addWidget(self.count_label)
+        layout.addLayout(search_layout)
+
         # Products Table
         self.table = QTableWidget()
         self.table.setColumnCount(11)
@@ -556,6 +576,9 @@ class ProductsWidget(QWidget):
         
         # Save column positions when moved
         self.table.horizontalHeader().sectionMoved.connect(self.on_column_moved)
+
+        # تحميل الصفحة التالية عند الوصول لنهاية الجدول
+        self.table.verticalScrollBar().valueChanged.connect(self.on_table_scrolled)
         
         layout.addWidget(self.table)
 
@@ -576,9 +599,33 @@ class ProductsWidget(QWidget):
             """)
 
     def load_products(self):
-        products = self.db_manager.get_products_with_details()
-        self.table.setRowCount(len(products))
-        for row, product in enumerate(products):
+        """تحميل الصفحة الأولى من المنتجات حسب نص البحث"""
+        self.load_products_page(None)
+
+    def load_products_page(self, after):
+        self.page_loading = True
+        get_executor().submit(
+            self.db_manager.get_products_page,
+            filter_text=self.search_input.text(),
+            after=after,
+            limit=PAGE_SIZE,
+            key='products.list',
+            on_result=lambda page: self.on_products_page_loaded(page, after is None),
+            on_error=self.on_load_error
+        )
+
+    def on_products_page_loaded(self, page, first_page):
+        self.page_loading = False
+        if first_page:
+            self.products = []
+            self.total_products = page.total_estimate
+            self.table.setRowCount(0)
+        self.next_cursor = page.next_cursor
+
+        start = len(self.products)
+        self.products.extend(page.rows)
+        self.table.setRowCount(len(self.products))
+        for row, product in enumerate(page.rows, start):
             for col, value in enumerate(product):
                 item = QTableWidgetItem(str(value) if value is not None else "")
                 item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
@@ -586,8 +633,20 @@ class ProductsWidget(QWidget):
                 if col == 0:  # ID column
                     item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
                 self.table.setItem(row, col, item)
-        
-        self.table.resizeColumnsToContents()
+
+        if first_page:
+            self.table.resizeColumnsToContents()
+        total = f"{self.total_products}+" if self.total_products >= COUNT_ESTIMATE_CAP else self.total_products
+        self.count_label.setText(f"عرض {len(self.products)} من {total}")
+
+    def on_table_scrolled(self, value):
+        scroll_bar = self.table.verticalScrollBar()
+        if self.next_cursor and not self.page_loading and value >= scroll_bar.maximum() - 5:
+            self.load_products_page(self.next_cursor)
+
+    def on_load_error(self, error):
+        self.page_loading = False
+        QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تحميل المنتجات: {str(error)}")
 
     def add_product(self):
         dialog = AddEditProductDialog(self, self.db_manager)
@@ -596,7 +655,8 @@ class ProductsWidget(QWidget):
             if self.db_manager.add_product(
                 data['name'], data['description'], data['unit_type'],
                 data['min_stock'], data['current_stock'], data['warehouse_id'],
-                data['suppliers'], data['wholesale_price'], data['retail_price']
+                data['suppliers'], data['wholesale_price'], data['retail_price'],
+                data['barcode']
             ):
                 self.load_products()
                 QMessageBox.information(self, "نجاح", "تم إضافة المنتج بنجاح")
@@ -609,20 +669,8 @@ class ProductsWidget(QWidget):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار منتج للتعديل")
             return
 
-        product_id = int(self.table.item(current_row, 0).text())
-        product_data = [
-            product_id,
-            self.table.item(current_row, 1).text(),
-            self.table.item(current_row, 2).text(),
-            self.table.item(current_row, 3).text(),
-            int(self.table.item(current_row, 4).text()),
-            int(self.table.item(current_row, 5).text()),
-            self.table.item(current_row, 6).text(),
-            self.table.item(current_row, 7).text(),
-            self.table.item(current_row, 8).text(),
-            self.table.item(current_row, 9).text(),
-            self.table.item(current_row, 10).text()
-        ]
+        product_data = self.products[current_row]
+        product_id = product_data.product_id
 
         dialog = AddEditProductDialog(self, self.db_manager, product_data)
         if dialog.exec() == QDialog.DialogCode.Accepted:
@@ -630,7 +678,8 @@ class ProductsWidget(QWidget):
             if self.db_manager.update_product(
                 product_id, data['name'], data['description'],
                 data['unit_type'], data['min_stock'], data['current_stock'],
-                data['warehouse_id'], data['suppliers'], data['wholesale_price'], data['retail_price']
+                data['warehouse_id'], data['suppliers'], data['wholesale_price'], data['retail_price'],
+                data['barcode']
             ):
                 self.load_products()
                 QMessageBox.information(self, "نجاح", "تم تحديث بيانات المنتج بنجاح")
@@ -643,7 +692,7 @@ class ProductsWidget(QWidget):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار منتج للحذف")
             return
 
-        product_id = int(self.table.item(current_row, 0).text())
+        product_id = self.products[current_row].product_id
         reply = QMessageBox.question(self, "تأكيد الحذف",
                                    "هل أنت متأكد من حذف هذا المنتج؟",
                                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
@@ -661,48 +710,13 @@ class ProductsWidget(QWidget):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار منتج لتحديث المخزون")
             return
 
-        product_id = int(self.table.item(current_row, 0).text())
+        product_id = self.products[current_row].product_id
         dialog = UpdateStockDialog(self, self.db_manager, product_id)
         
+        # النافذة تحفظ التغييرات عبر update_product_warehouse قبل أن تُغلق
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            updates = dialog.get_data()  # الآن نحصل على قائمة من التحديثات
-            success = True
-            
-            try:
-                # Start transaction
-                conn = self.db_manager.get_connection()
-                cursor = conn.cursor()
-                cursor.execute("BEGIN TRANSACTION")
-                
-                total_stock = 0
-                # تحديث كل مخزن
-                for update in updates:
-                    warehouse_id = update['warehouse_id']
-                    quantity = update['quantity']
-                    total_stock += quantity
-                    
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO warehouse_products 
-                        (warehouse_id, product_id, quantity) 
-                        VALUES (?, ?, ?)
-                    """, (warehouse_id, product_id, quantity))
-                
-                # تحديث إجمالي المخزون في جدول المنتجات
-                cursor.execute("""
-                    UPDATE products 
-                    SET current_stock = ? 
-                    WHERE product_id = ?
-                """, (total_stock, product_id))
-                
-                conn.commit()
-                self.load_products()
-                QMessageBox.information(self, "نجاح", "تم تحديث المخزون بنجاح")
-                
-            except Exception as e:
-                conn.rollback()
-                success = False
-                print(f"Error updating stock: {e}")
-                QMessageBox.warning(self, "خطأ", "حدث خطأ أثناء تحديث المخزون")
+            self.load_products()
+            QMessageBox.information(self, "نجاح", "تم تحديث المخزون بنجاح")
 
     def on_column_moved(self, logical_index, old_visual_index, new_visual_index):
         # You can save the column order here if needed
@@ -0,0 +1,303 @@
+import contextvars
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Dict, List, Optional
+
+SLOW_QUERY_MS = float(os.environ.get('NOOR_SLOW_QUERY_MS', 50))
+SLOW_QUERY_LOG = os.path.join('logs', 'slow_queries.log')
+# Upper bounds (ms) of the histogram buckets; the last bucket is open ended
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+_current_action = contextvars.ContextVar('query_action', default=None)
+_hooks: List[Callable] = []
+_WHITESPACE = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+
+class StatementRecord:
+    """One executed statement as seen by the instrumentation hooks.
+
+    tagged_action is the ui_action() in effect, if any. action falls back to
+    the nearest UI caller on the stack, which is only worth walking for
+    statements that are logged, so it is resolved on first access.
+    """
+    __slots__ = ('sql', 'params_shape', 'rows', 'elapsed_ms', 'tagged_action', '_action', 'plan')
+
+    def __init__(self, sql, params_shape, tagged_action=None):
+        self.sql = sql
+        self.params_shape = params_shape
+        self.rows = 0
+        self.elapsed_ms = 0.0
+        self.tagged_action = tagged_action
+        self._action = tagged_action
+        self.plan = None
+
+    @property
+    def action(self) -> str:
+        # Hooks run inside the cursor call, so the caller is still on the stack
+        if self._action is None:
+            self._action = current_action()
+        return self._action
+
+
+@contextmanager
+def ui_action(name: str):
+    """Tag every statement run inside the block with a UI action name"""
+    token = _current_action.set(name)
+    try:
+        yield
+    finally:
+        _current_action.reset(token)
+
+
+def current_action() -> str:
+    action = _current_action.get()
+    if action:
+        return action
+    # Fall back to the nearest caller in one of the UI modules
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename.endswith('_ui.py') or filename == 'main.py':
+            return f"{filename[:-3]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return ''
+
+
+def add_hook(hook: Callable[[StatementRecord], None]):
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[StatementRecord], None]):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def normalize_sql(sql: str) -> str:
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def params_shape(params) -> str:
+    # Record only the types of the parameters, never their values
+    if not params:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{k}: {type(v).__name__}" for k, v in params.items()) + '}'
+    return '(' + ', '.join(type(v).__name__ for v in params) + ')'
+
+
+def is_full_scan(plan: List[str]) -> bool:
+    # Virtual tables (FTS5) report SCAN ... VIRTUAL TABLE INDEX even when the
+    # module serves the query from its own index
+    return any(step.startswith('SCAN ') and 'USING' not in step
+               and 'VIRTUAL TABLE' not in step
+               and step != 'SCAN CONSTANT ROW' for step in plan)
+
+
+class QueryStats:
+    """Per-statement timing histograms, aggregated across all connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+        self._plans: Dict[str, Optional[List[str]]] = {}
+
+    def needs_plan(self, sql: str) -> bool:
+        return sql not in self._plans
+
+    def set_plan(self, sql: str, plan: Optional[List[str]]):
+        with self._lock:
+            self._plans[sql] = plan
+
+    def record(self, rec: StatementRecord):
+        # Untagged statements are attributed by walking the stack only the
+        # first time they are seen
+        action = rec.tagged_action
+        if action is None and rec.sql not in self._stats:
+            action = rec.action
+        with self._lock:
+            entry = self._stats.get(rec.sql)
+            if entry is None:
+                entry = self._stats[rec.sql] = {
+                    'sql': rec.sql, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'rows': 0, 'buckets': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1),
+                    'actions': set(), 'params_shape': rec.params_shape,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += rec.elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], rec.elapsed_ms)
+            entry['rows'] += rec.rows
+            if action:
+                entry['actions'].add(action)
+            bucket = len(HISTOGRAM_BUCKETS_MS)
+            for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+                if rec.elapsed_ms <= bound:
+                    bucket = i
+                    break
+            entry['buckets'][bucket] += 1
+
+    def snapshot(self) -> List[Dict]:
+        """Copies of all entries, slowest total time first"""
+        with self._lock:
+            entries = []
+            for sql, entry in self._stats.items():
+                copy = dict(entry, actions=sorted(entry['actions']),
+                            buckets=list(entry['buckets']))
+                copy['plan'] = self._plans.get(sql)
+                entries.append(copy)
+        entries.sort(key=lambda e: e['total_ms'], reverse=True)
+        return entries
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+stats = QueryStats()
+
+_slow_logger = logging.getLogger('noor.slow_queries')
+_slow_logger.propagate = False
+
+
+def set_slow_query_threshold(ms: float):
+    global SLOW_QUERY_MS
+    SLOW_QUERY_MS = ms
+
+
+def _slow_query_hook(rec: StatementRecord):
+    if rec.elapsed_ms < SLOW_QUERY_MS and not rec.plan:
+        return
+    if not _slow_logger.handlers:
+        os.makedirs(os.path.dirname(SLOW_QUERY_LOG), exist_ok=True)
+        handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=1024 * 1024,
+                                      backupCount=3, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        _slow_logger.addHandler(handler)
+        _slow_logger.setLevel(logging.INFO)
+    message = (f"{rec.elapsed_ms:.1f}ms rows={rec.rows} action={rec.action or '-'} "
+               f"params={rec.params_shape} sql={rec.sql}")
+    if rec.plan:
+        message += " plan=" + ' | '.join(rec.plan)
+    _slow_logger.info(message)
+
+
+add_hook(stats.record)
+add_hook(_slow_query_hook)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement, including fetching its rows"""
+
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        rec = StatementRecord(normalize_sql(sql), params_shape(parameters), _current_action.get())
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            rec.elapsed_ms = (time.perf_counter() - start) * 1000
+            self._explain(rec, sql, parameters)
+            self._begin(rec)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        seq_of_parameters = list(seq_of_parameters)
+        shape = params_shape(seq_of_parameters[0]) if seq_of_parameters else '()'
+        rec = StatementRecord(normalize_sql(sql), f"{len(seq_of_parameters)} x {shape}",
+                              _current_action.get())
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            rec.elapsed_ms = (time.perf_counter() - start) * 1000
+            self._begin(rec)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 1 if row is not None else 0)
+        self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _begin(self, rec):
+        if self.description is None:
+            # Nothing to fetch: DML, DDL and transaction control end here
+            rec.rows = max(self.rowcount, 0)
+            _dispatch(rec)
+        else:
+            self._pending = rec
+
+    def _fetched(self, start, rows):
+        if self._pending is not None:
+            self._pending.elapsed_ms += (time.perf_counter() - start) * 1000
+            self._pending.rows += rows
+
+    def _finish(self):
+        if self._pending is not None:
+            rec, self._pending = self._pending, None
+            _dispatch(rec)
+
+    def _explain(self, rec, sql, parameters):
+        if not stats.needs_plan(rec.sql) or not rec.sql.upper().startswith(_EXPLAINABLE):
+            return
+        try:
+            # A plain cursor, so the EXPLAIN itself is not instrumented
+            plan_cursor = sqlite3.Cursor(self.connection)
+            plan = [row[3] for row in plan_cursor.execute(
+                "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()]
+        except sqlite3.Error:
+            plan = []
+        full_scan = plan if is_full_scan(plan) else None
+        stats.set_plan(rec.sql, full_scan)
+        # Only the first run of a scanning statement carries the plan
+        rec.plan = full_scan
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors report every statement to the hooks"""
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _dispatch(rec: StatementRecord):
+    for hook in list(_hooks):
+        try:
+            hook(rec)
+        except Exception as e:
+            print(f"Query instrumentation hook failed: {e}")
@@ -0,0 +1,71 @@
+from typing import Callable, NamedTuple, Optional, Union, get_args, get_type_hints
+
+# Typed rows returned by DatabaseManager when as_records=True.
+# NamedTuples keep no per-instance dict and still index like the old tuples.
+
+
+class ProductRow(NamedTuple):
+    product_id: int
+    product_name: str
+    description: Optional[str]
+    unit_type: Optional[str]
+    min_stock_level: int
+    current_stock: int
+    warehouse_name: Optional[str]
+    min_supply_price: Optional[float]
+    suppliers: Optional[str]
+    wholesale_price: Optional[float]
+    retail_price: Optional[float]
+    warehouse_id: Optional[int]
+
+
+class CustomerRow(NamedTuple):
+    customer_id: int
+    customer_name: str
+    address: Optional[str]
+    phone_number: Optional[str]
+    discount: float
+
+
+class SupplierRow(NamedTuple):
+    supplier_id: int
+    supplier_name: str
+    contact_details: Optional[str]
+    products: Optional[str]
+    product_count: int
+
+
+def _numeric_converters(record_cls):
+    converters = []
+    for field_type in get_type_hints(record_cls).values():
+        # Optional[X] is Union[X, None]
+        if getattr(field_type, '__origin__', None) is Union:
+            field_type = get_args(field_type)[0]
+        converters.append(field_type if field_type in (int, float) else None)
+    return tuple(converters)
+
+
+_factories = {}
+
+
+def record_factory(record_cls) -> Callable:
+    """sqlite3 row_factory building record_cls with int/float fields coerced"""
+    factory = _factories.get(record_cls)
+    if factory is None:
+        converters = _numeric_converters(record_cls)
+        make = record_cls._make
+
+        def factory(cursor, row):
+            return make(value if convert is None or value is None else convert(value)
+                        for convert, value in zip(converters, row))
+
+        _factories[record_cls] = factory
+    return factory
+
+
+class Page(NamedTuple):
+    rows: list
+    # Exact below COUNT_ESTIMATE_CAP, otherwise the cap itself; None after page 1
+    total_estimate: Optional[int]
+    # Pass back as `after` to fetch the next page; None on the last page
+    next_cursor: Optional[tuple]
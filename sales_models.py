@@ -0,0 +1,281 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+from PyQt6.QtCore import (Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex,
+                          QEvent, pyqtSignal)
+from PyQt6.QtGui import QColor, QPainter
+from PyQt6.QtWidgets import QStyle, QStyledItemDelegate, QTableView, QHeaderView
+from cart import Cart, CartLine
+
+# عدد الصفوف التي تُقاس لحساب عرض الأعمدة بدلاً من قياس كل الصفوف
+COLUMN_SIZE_SAMPLE = 50
+LOW_STOCK_COLOR = QColor("#ff4444")
+
+
+def group_by_product(rows: Sequence) -> List:
+    """صف واحد لكل منتج بدلاً من صف لكل مخزن؛ المخازن تُختار عند البيع"""
+    grouped = {}
+    for row in rows:
+        first = grouped.get(row.product_id)
+        if first is None:
+            grouped[row.product_id] = row._replace(warehouse_id=None)
+        elif row.warehouse_name:
+            names = [name for name in (first.warehouse_name, row.warehouse_name) if name]
+            grouped[row.product_id] = first._replace(warehouse_name="، ".join(names))
+    return list(grouped.values())
+
+
+class ProductsTableModel(QAbstractTableModel):
+    """نموذج قائمة المنتجات؛ الخلايا تُحسب عند العرض فقط ولا تُخزن"""
+
+    HEADERS = ["الكود", "المنتج", "سعر البيع", "سعر الجملة", "المخزون"]
+    STOCK_COLUMN = 4
+
+    def __init__(self, inventory, parent=None):
+        super().__init__(parent)
+        self.inventory = inventory
+        self.products: List = []
+        self._rows_by_product: Dict[int, List[int]] = {}
+
+    def set_products(self, products: Sequence):
+        self.beginResetModel()
+        self.products = list(products)
+        self._rows_by_product = {}
+        for row, product in enumerate(self.products):
+            self._rows_by_product.setdefault(product.product_id, []).append(row)
+        self.endResetModel()
+
+    def rows_of(self, product_id: int) -> List[int]:
+        """صفوف المنتج في النموذج"""
+        return self._rows_by_product.get(product_id, [])
+
+    def replace_product(self, row: int, product):
+        """استبدال بيانات صف واحد دون إعادة بناء النموذج"""
+        self.products[row] = product
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+
+    def refresh_products(self, product_ids: Iterable[int]):
+        """إعادة رسم خلايا المخزون لمنتجات تغير رصيدها أو الكمية المحجوزة منها في السلة"""
+        for product_id in set(product_ids):
+            for row in self.rows_of(product_id):
+                index = self.index(row, self.STOCK_COLUMN)
+                self.dataChanged.emit(index, index)
+
+    def stock(self, row: int) -> int:
+        # المعروض هو المتاح في كل المخازن بعد خصم ما حجزته السلال المفتوحة
+        return self.inventory.total_available(self.products[row].product_id)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.products)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        product = self.products[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return str(product.product_id)
+            if column == 1:
+                return product.product_name
+            if column == 2:
+                return str(product.retail_price)
+            if column == 3:
+                return str(product.wholesale_price)
+            return str(self.stock(index.row()))
+        if role == Qt.ItemDataRole.ForegroundRole and column == self.STOCK_COLUMN:
+            # تلوين المخزون حسب الحد الأدنى
+            if self.stock(index.row()) <= product.min_stock_level:
+                return LOW_STOCK_COLOR
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+
+class ProductFilterProxy(QAbstractProxyModel):
+    """عرض مجموعة جزئية من صفوف النموذج حسب نتائج البحث
+
+    يحتفظ بقائمة أرقام الصفوف المطابقة فقط، فتكلفة التصفية تتناسب مع عدد
+    النتائج لا مع حجم الكتالوج، ويتم تخطي المنتجات التي نفذ مخزونها.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[int] = []
+        self._positions: Optional[dict] = None
+
+    def set_rows(self, rows: Sequence[int]):
+        source = self.sourceModel()
+        self.beginResetModel()
+        self._rows = [row for row in rows if source.stock(row) != 0]
+        self._positions = None
+        self.endResetModel()
+
+    def product(self, index):
+        return self.sourceModel().products[self._rows[index.row()]]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.sourceModel().columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self._rows)):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()], proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if self._positions is None:
+            self._positions = {row: position for position, row in enumerate(self._rows)}
+        position = self._positions.get(source_index.row())
+        if position is None:
+            return QModelIndex()
+        return self.createIndex(position, source_index.column())
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        # ترقيم الصفوف حسب ترتيبها في النتائج لا في الكتالوج
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Vertical:
+            return str(section + 1)
+        return super().headerData(section, orientation, role)
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelReset.connect(lambda: self.set_rows([]))
+        model.dataChanged.connect(self._source_data_changed)
+
+    def _source_data_changed(self, top_left, bottom_right, roles=()):
+        if top_left.row() == bottom_right.row():
+            # تغيير صف واحد: تحديث موضعه في النتائج فقط إن كان ظاهراً
+            position = self.mapFromSource(top_left)
+            if position.isValid():
+                self.dataChanged.emit(position, self.index(position.row(), bottom_right.column()))
+        elif self._rows:
+            self.dataChanged.emit(self.index(0, top_left.column()),
+                                  self.index(len(self._rows) - 1, bottom_right.column()))
+
+
+class OrderTableModel(QAbstractTableModel):
+    """عرض أسطر سلة الطلب الحالي؛ كل التعديلات تمر من هنا لتحديث الجدول"""
+
+    HEADERS = ["الكود", "المنتج", "الكمية", "السعر", "الإجمالي", "نوع السعر", "حذف"]
+    DELETE_COLUMN = 6
+
+    # أرقام المنتجات التي تغيرت الكمية المحجوزة منها في السلة
+    reserved_changed = pyqtSignal(list)
+
+    def __init__(self, cart: Cart, parent=None):
+        super().__init__(parent)
+        self.cart = cart
+
+    def add_line(self, line: CartLine) -> int:
+        """إضافة سطر أو دمجه مع السطر المماثل؛ يرفع InsufficientStock إن لم تكفِ الكمية"""
+        row = self.cart.find(*line.key)
+        if row is not None:
+            self.set_quantity(row, self.cart[row].quantity + line.quantity)
+            return row
+        # الحجز قبل إعلان الصف حتى لا يبقى الجدول في حالة ناقصة عند الرفض
+        self.cart.reserve(line)
+        row = len(self.cart)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.cart.add(line, reserved=True)
+        self.endInsertRows()
+        self.reserved_changed.emit([line.product_id])
+        return row
+
+    def remove_line(self, row: int):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        line = self.cart.remove(row)
+        self.endRemoveRows()
+        self.reserved_changed.emit([line.product_id])
+
+    def set_quantity(self, row: int, quantity: int):
+        self.cart.set_quantity(row, quantity)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.DELETE_COLUMN))
+        self.reserved_changed.emit([self.cart[row].product_id])
+
+    def clear(self):
+        product_ids = list({line.product_id for line in self.cart})
+        self.beginResetModel()
+        self.cart.clear()
+        self.endResetModel()
+        if product_ids:
+            self.reserved_changed.emit(product_ids)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.cart)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        line = self.cart[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(line.product_id)
+        if column == 1:
+            return line.product_name
+        if column == 2:
+            return str(line.quantity)
+        if column == 3:
+            return str(line.unit_price)
+        if column == 4:
+            return str(line.total)
+        if column == 5:
+            return line.price_type
+        return "حذف"
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+
+class DeleteButtonDelegate(QStyledItemDelegate):
+    """يرسم زر الحذف داخل الخلية بدلاً من إنشاء QPushButton لكل سطر"""
+
+    clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        rect = option.rect.adjusted(4, 3, -4, -3)
+        hovered = option.state & QStyle.StateFlag.State_MouseOver
+        painter.setBrush(QColor("#A52A2A" if hovered else "#8B0000"))
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.drawRoundedRect(rect, 3, 3)
+        painter.setPen(QColor("white"))
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, index.data())
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and option.rect.contains(event.position().toPoint())):
+            self.clicked.emit(index.row())
+            return True
+        return False
+
+
+def configure_table_view(view: QTableView):
+    """إعدادات مشتركة: ارتفاع صفوف ثابت وقياس عرض الأعمدة من عينة من الصفوف"""
+    view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+    view.horizontalHeader().setResizeContentsPrecision(COLUMN_SIZE_SAMPLE)
+    view.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+    view.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
@@ -1,41 +1,67 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
-                           QTableWidgetItem, QPushButton, QLabel, QLineEdit,
+                           QTableWidgetItem, QTableView, QPushButton, QLabel, QLineEdit,
                            QDialog, QMessageBox, QComboBox, QSpinBox, QDoubleSpinBox,
                            QFrame, QCompleter, QHeaderView, QGroupBox, QRadioButton,
-                           QCheckBox)
+                           QCheckBox, QApplication, QSystemTrayIcon, QStyle)
 from PyQt6.QtCore import Qt, QTimer, QRect, QSize
-from PyQt6.QtGui import QIcon, QPixmap, QColor
+from PyQt6.QtGui import QIcon, QPixmap
 from database_manager import DatabaseManager
-from datetime import datetime
-import json
-import qrcode
+from db_worker import get_executor
+from checkout_queue import get_checkout_queue
+from product_search import ProductSearchIndex, timed_search
+from sales_models import (ProductsTableModel, ProductFilterProxy, OrderTableModel,
+                          DeleteButtonDelegate, configure_table_view, group_by_product)
+from cart import Cart, CartLine
+from inventory import InsufficientStock
+from allocation import Allocator
 import os
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_RIGHT
-import arabic_reshaper
-from bidi.algorithm import get_display
-from reportlab.platypus import Table, TableStyle, Spacer
-from reportlab.lib import colors
+import sqlite3
+from invoice_renderer import InvoiceSnapshot
+from invoice_service import get_invoice_service, PRIORITY_COUNTER, PRIORITY_SALE
+
+CUSTOMERS_PAGE_SIZE = 100
+# مهلة انتظار توقف الكتابة قبل تنفيذ البحث
+SEARCH_DEBOUNCE_MS = 120
+# فترة فحص التعديلات التي تمت على الكتالوج من شاشات أو أجهزة أخرى
+CATALOG_POLL_MS = 3000
+# عدد المنتجات المتغيرة الذي تصبح بعده إعادة التحميل الكامل أرخص
+CATALOG_REFRESH_LIMIT = 200
 
 class SalesWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.db_manager = DatabaseManager()
-        self.current_order = {
-            'items': [],
-            'customer': None,
-            'total': 0,
-            'discount': 0
-        }
+        self.db_executor = get_executor()
+        self.inventory = self.db_manager.inventory
+        # اختيار المخازن التي يُخصم منها كل سطر
+        self.allocator = Allocator(self.inventory)
+        # رسم الفواتير في عمليات منفصلة؛ نتابع فقط الفواتير التي طلبتها هذه الشاشة
+        self.invoice_service = get_invoice_service()
+        self.invoice_service.rendered.connect(self.on_invoice_rendered)
+        self.invoice_service.failed.connect(self.on_invoice_failed)
+        self.invoice_jobs = set()
+        # طلبات تُطبع فواتيرها بعد حفظها، وآخر طلب حُفظ من هذه الشاشة لإعادة طباعته
+        self.print_checkouts = set()
+        self.last_order_id = None
+        self.products_data = []
+        self.search_index = ProductSearchIndex([])
+        # سلة الطلب الحالي بمجاميعها، وبيانات العميل المختار
+        self.cart = Cart(inventory=self.inventory)
+        self.current_order = {'customer': None}
+        # آخر تغيير في الكتالوج تم عرضه، ورمز آخر إصدار مفحوص لقاعدة البيانات
+        self.catalog_change_id = 0
+        self.data_version = None
+        # إعادة تحميل مؤجلة حتى تُحفظ الطلبات المعلقة، ورقم آخر طلب سُجل قبل التحميل الجاري
+        self.reload_deferred = False
+        self.load_checkouts = 0
         self.setup_ui()
+        self.setup_checkout_queue()
         self.load_products_data()
+        self.catalog_timer = QTimer(self)
+        self.catalog_timer.setInterval(CATALOG_POLL_MS)
+        self.catalog_timer.timeout.connect(self.check_catalog_changes)
+        self.catalog_timer.start()
+        self.barcode_input.setFocus()
 
     def setup_ui(self):
         """إعداد واجهة المستخدم"""
@@ -58,6 +84,23 @@ class SalesWindow(QWidget):
         """)
         search_layout = QVBoxLayout(search_frame)
         
+        # Barcode Scanner
+        self.barcode_input = QLineEdit()
+        self.barcode_input.setPlaceholderText("امسح الباركود...")
+        self.barcode_input.setStyleSheet("""
+            QLineEdit {
+                padding: 8px;
+                background-color: rgba(10, 17, 40, 0.95);
+                color: #c5a572;
+                border: 2px solid #c5a572;
+                border-radius: 5px;
+                font-size: 14px;
+            }
+        """)
+        # الماسح الضوئي يكتب الرمز ثم يضغط Enter
+        self.barcode_input.returnPressed.connect(self.scan_barcode)
+        search_layout.addWidget(self.barcode_input)
+        
         # Product Search
         self.product_search = QLineEdit()
         self.product_search.setPlaceholderText("بحث عن منتج...")
@@ -71,17 +114,23 @@ class SalesWindow(QWidget):
                 font-size: 14px;
             }
         """)
-        self.product_search.textChanged.connect(self.search_products)
+        # تأجيل البحث حتى يتوقف المستخدم عن الكتابة
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_products)
+        self.product_search.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.product_search)
         
         # Products Quick List
-        self.products_list = QTableWidget()
-        self.products_list.setColumnCount(5)
-        self.products_list.setHorizontalHeaderLabels([
-            "الكود", "المنتج", "سعر البيع", "سعر الجملة", "المخزون"
-        ])
+        self.products_model = ProductsTableModel(self.inventory, self)
+        self.products_proxy = ProductFilterProxy(self)
+        self.products_proxy.setSourceModel(self.products_model)
+        self.products_list = QTableView()
+        self.products_list.setModel(self.products_proxy)
+        configure_table_view(self.products_list)
         self.products_list.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: rgba(10, 17, 40, 0.95);
                 color: #c5a572;
                 border: none;
@@ -93,7 +142,7 @@ class SalesWindow(QWidget):
                 border: 1px solid #c5a572;
             }
         """)
-        self.products_list.itemDoubleClicked.connect(self.add_product_to_order)
+        self.products_list.doubleClicked.connect(self.add_product_to_order)
         search_layout.addWidget(self.products_list)
         
         # Customer Section
@@ -149,13 +198,18 @@ class SalesWindow(QWidget):
         order_layout = QVBoxLayout(order_frame)
         
         # Order Table
-        self.order_table = QTableWidget()
-        self.order_table.setColumnCount(7)
-        self.order_table.setHorizontalHeaderLabels([
-            "الكود", "المنتج", "الكمية", "السعر", "الإجمالي", "نوع السعر", "حذف"
-        ])
+        self.order_model = OrderTableModel(self.cart, self)
+        # تحديث المخزون المعروض للمنتجات التي تغير حجزها في السلة فقط
+        self.order_model.reserved_changed.connect(self.products_model.refresh_products)
+        self.order_table = QTableView()
+        self.order_table.setModel(self.order_model)
+        configure_table_view(self.order_table)
+        self.order_table.setMouseTracking(True)
+        self.delete_delegate = DeleteButtonDelegate(self.order_table)
+        self.delete_delegate.clicked.connect(self.remove_product_from_order)
+        self.order_table.setItemDelegateForColumn(OrderTableModel.DELETE_COLUMN, self.delete_delegate)
         self.order_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: rgba(10, 17, 40, 0.95);
                 color: #c5a572;
                 border: none;
@@ -206,7 +260,7 @@ class SalesWindow(QWidget):
                 font-size: 12px;
             }
         """)
-        self.discount_input.textChanged.connect(self.update_totals)
+        self.discount_input.textChanged.connect(self.update_order_totals)
         discount_layout.addWidget(discount_label)
         discount_layout.addWidget(self.discount_input)
         totals_layout.addLayout(discount_layout)
@@ -242,6 +296,7 @@ class SalesWindow(QWidget):
         
         # Connect VAT checkbox
         self.vat_checkbox.stateChanged.connect(self.on_vat_changed)
+        self.vat_rate.valueChanged.connect(self.update_order_totals)
         
         # Totals Labels
         totals_labels_layout = QHBoxLayout()
@@ -268,7 +323,7 @@ class SalesWindow(QWidget):
             actions_layout.addWidget(btn)
         
         self.save_order_btn.clicked.connect(self.save_order)
-        self.print_invoice_btn.clicked.connect(lambda: self.print_invoice())
+        self.print_invoice_btn.clicked.connect(self.save_and_print)
         self.clear_order_btn.clicked.connect(self.clear_order)
         
         order_layout.addLayout(actions_layout)
@@ -295,79 +350,147 @@ class SalesWindow(QWidget):
             }
         """
 
-    def get_delete_button_style(self):
-        """نمط زر الحذف"""
-        return """
-            QPushButton {
-                background-color: #8B0000;  /* أحمر داكن */
-                color: white;
-                border: none;
-                border-radius: 3px;
-                padding: 5px;
-                min-width: 60px;
-            }
-            QPushButton:hover {
-                background-color: #A52A2A;  /* أحمر فاتح عند التحويم */
-            }
-            QPushButton:pressed {
-                background-color: #800000;  /* أحمر داكن عند الضغط */
-            }
-        """
-
     def load_products_data(self):
-        """تحميل بيانات المنتجات من قاعدة البيانات"""
-        self.products_data = self.db_manager.get_products_with_details()
-        self.update_products_list()
-
-    def update_products_list(self, search_text=""):
-        """تحديث قائمة المنتجات مع إمكانية البحث"""
-        self.products_list.setRowCount(0)
-        self.products_list.setColumnCount(5)
-        self.products_list.setHorizontalHeaderLabels([
-            "الكود", "المنتج", "سعر البيع", "سعر الجملة", "المخزون"
-        ])
-        
-        for product in self.products_data:
-            if search_text.lower() in product[1].lower():
-                # تحديث المخزون المتاح من قاعدة البيانات
-                current_stock = self.db_manager.get_warehouse_product_quantity(
-                    product[11], product[0])
-                
-                if current_stock == 0:  # تخطي المنتجات التي نفذت من المخزون
-                    continue
-                    
-                row = self.products_list.rowCount()
-                self.products_list.insertRow(row)
-                
-                # إضافة بيانات المنتج
-                self.products_list.setItem(row, 0, QTableWidgetItem(str(product[0])))  # الكود
-                self.products_list.setItem(row, 1, QTableWidgetItem(product[1]))  # اسم المنتج
-                self.products_list.setItem(row, 2, QTableWidgetItem(str(product[10])))  # سعر البيع
-                self.products_list.setItem(row, 3, QTableWidgetItem(str(product[9])))  # سعر الجملة
-                self.products_list.setItem(row, 4, QTableWidgetItem(str(current_stock)))  # المخزون الحالي
-                
-                # تلوين المخزون حسب الحد الأدنى
-                if current_stock <= product[5]:
-                    self.products_list.item(row, 4).setForeground(QColor("#ff4444"))
+        """تحميل بيانات المنتجات من قاعدة البيانات في الخلفية"""
+        # الطلبات المعلقة لم تُحفظ بعد؛ قراءة أرصدتها الآن تلغي خصمها من اللقطة
+        if self.checkout_queue.pending_count():
+            self.reload_deferred = True
+            return
+        self.reload_deferred = False
+        self.load_checkouts = self.checkout_queue.queued
+        # أي كتابة بعد هذه اللحظة ستُكتشف في الفحص التالي
+        self.data_version = self.db_manager.get_data_version()
+        self.db_executor.cancel('sales.catalog_changes')
+        self.db_executor.submit(
+            self.build_products_index,
+            key='sales.products',
+            on_result=self.on_products_loaded,
+            on_error=self.on_load_error
+        )
 
+    def build_products_index(self):
+        """يعمل في الخلفية: تحميل المنتجات وبناء فهرس البحث"""
+        # رقم التغيير يُقرأ قبل البيانات حتى لا يضيع تغيير يحدث أثناء التحميل
+        change_id = self.db_manager.get_catalog_change_id()
+        self.db_manager.prune_catalog_changes()
+        rows, stock = self.db_manager.get_products_with_stock(as_records=True)
+        products = group_by_product(rows)
+        return change_id, ProductSearchIndex(products, self.db_manager.get_barcodes()), stock
+
+    def on_products_loaded(self, result):
+        """استلام بيانات المنتجات وفهرسها بعد انتهاء الاستعلام"""
+        change_id, search_index, stock = result
+        if self.checkout_queue.queued != self.load_checkouts:
+            # طلب سُجل أثناء القراءة وقد لا تتضمن الأرصدة خصمه؛ التحميل من جديد بعد حفظه
+            self.load_products_data()
+            return
+        # الاستبدال في خيط الواجهة نفسه الذي تُسجل فيه الطلبات فلا يسبقه طلب جديد
+        self.inventory.replace_all(stock)
+        self.catalog_change_id = change_id
+        self.search_index = search_index
+        self.products_data = search_index.products
+        self.products_model.set_products(self.products_data)
+        self.search_products()
+        # قياس عرض الأعمدة مرة واحدة لكل تحميل وليس مع كل بحث
         self.products_list.resizeColumnsToContents()
 
+    def on_load_error(self, error):
+        QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تحميل البيانات: {str(error)}")
+
+    def stop_background_work(self):
+        """إيقاف المؤقتات وإلغاء حجوزات السلة؛ يُستدعى قبل إغلاق اتصالات قاعدة البيانات وسجل الطلبات"""
+        self.catalog_timer.stop()
+        self.search_timer.stop()
+        self.reload_deferred = False
+        # لقطة المخزون مشتركة وتبقى بعد تسجيل الخروج، فلا تُترك فيها حجوزات سلة لم تُبع
+        self.order_model.clear()
+
+    def check_catalog_changes(self):
+        """فحص سريع لتعديلات قاعدة البيانات ثم تحميل المنتجات المتغيرة فقط"""
+        try:
+            version = self.db_manager.get_data_version()
+            if version == self.data_version:
+                return
+            # الطلبات المعلقة لم تُحفظ بعد؛ قراءة أرصدتها الآن تلغي خصمها من اللقطة
+            if self.checkout_queue.pending_count():
+                return
+        except sqlite3.ProgrammingError:
+            # الاتصالات أو سجل الطلبات أُغلقت: النافذة في طريقها للإغلاق
+            self.stop_background_work()
+            return
+        self.data_version = version
+        self.db_executor.submit(
+            self.load_catalog_changes,
+            self.catalog_change_id,
+            key='sales.catalog_changes',
+            on_result=self.on_catalog_changes,
+            on_error=self.on_load_error
+        )
+
+    def load_catalog_changes(self, since_id):
+        """يعمل في الخلفية: قراءة صفوف وأرصدة المنتجات التي تغيرت بعد since_id"""
+        change_id, product_ids = self.db_manager.get_catalog_changes(since_id)
+        # التحديث الجزئي قد يستمر طويلاً دون إعادة تحميل كاملة، فيُقلم السجل هنا أيضاً
+        self.db_manager.prune_catalog_changes()
+        if product_ids is None or len(product_ids) > CATALOG_REFRESH_LIMIT:
+            return change_id, None, [], {}, {}
+        return (change_id, product_ids,
+                self.db_manager.get_catalog_rows(product_ids, as_records=True),
+                self.db_manager.get_barcodes(product_ids),
+                self.inventory.read_quantities(product_ids))
+
+    def on_catalog_changes(self, result):
+        """تطبيق التغييرات على الصفوف المعنية، أو إعادة التحميل الكامل عند الضرورة"""
+        change_id, product_ids, rows, barcodes, quantities = result
+        if product_ids is None:
+            self.load_products_data()
+            return
+        if not product_ids:
+            self.catalog_change_id = change_id
+            return
+        if self.checkout_queue.pending_count():
+            # طلب سُجل أثناء القراءة؛ إعادة المحاولة في الفحص التالي
+            self.data_version = None
+            return
+
+        self.inventory.replace_quantities(product_ids, quantities)
+        new_rows = {product.product_id: product for product in group_by_product(rows)}
+        for product_id in product_ids:
+            old_rows = self.products_model.rows_of(product_id)
+            product = new_rows.get(product_id)
+            if not old_rows and product is None:
+                continue
+            # منتج جديد أو محذوف: ترتيب الصفوف يتغير
+            if not old_rows or product is None:
+                self.load_products_data()
+                return
+            # تغير الاسم أو الباركود يتطلب إعادة بناء فهرس البحث
+            if not self.search_index.update_product(old_rows[0], product,
+                                                    barcodes.get(product_id)):
+                self.load_products_data()
+                return
+            self.products_model.replace_product(old_rows[0], product)
+        self.catalog_change_id = change_id
+
+    def update_products_list(self, rows):
+        """عرض صفوف المنتجات المطابقة للبحث"""
+        self.products_proxy.set_rows(rows)
+
     def search_products(self):
-        """البحث في المنتجات"""
-        search_text = self.product_search.text()
-        self.update_products_list(search_text)
+        """البحث في المنتجات من الفهرس المحفوظ في الذاكرة مع قياس زمن الاستجابة"""
+        self.search_timer.stop()
+        timed_search(self.search_index, self.product_search.text(), self.update_products_list)
 
-    def add_product_to_order(self, item):
+    def add_product_to_order(self, index):
         """إضافة منتج إلى الطلب الحالي"""
-        row = item.row()
-        product_id = int(self.products_list.item(row, 0).text())
-        product_name = self.products_list.item(row, 1).text()
-        retail_price = float(self.products_list.item(row, 2).text())
-        wholesale_price = float(self.products_list.item(row, 3).text())
+        product = self.products_proxy.product(index)
+        product_id = product.product_id
+        product_name = product.product_name
+        retail_price = product.retail_price or 0
+        wholesale_price = product.wholesale_price or 0
         
-        # تحديث المخزون المتاح من قاعدة البيانات
-        current_stock = self.db_manager.get_warehouse_product_quantity(
-            self.products_data[row][11], product_id)
+        # أكبر كمية يمكن توزيعها على المخازن حسب سياسة التوزيع
+        current_stock = self.allocator.available(product_id)
         
         # فتح نافذة تحديد الكمية والسعر
         price_dialog = PriceQuantityDialog(wholesale_price, retail_price, current_stock)
@@ -376,59 +499,52 @@ class SalesWindow(QWidget):
             selected_price = price_dialog.get_selected_price()
             price_type = price_dialog.get_price_type()
             
-            # التحقق من المخزون مرة أخرى قبل الإضافة
-            current_stock = self.db_manager.get_warehouse_product_quantity(
-                self.products_data[row][11], product_id)
-            if quantity > current_stock:
+            # سطر لكل مخزن تختاره سياسة التوزيع؛ يفشل إن نقص المتاح أثناء فتح النافذة
+            try:
+                for warehouse_id, warehouse_quantity in self.allocator.allocate(product_id, quantity):
+                    self.order_model.add_line(CartLine(
+                        product_id, product_name, warehouse_id, warehouse_quantity,
+                        selected_price, price_type, product.min_supply_price or 0))
+            except InsufficientStock as e:
                 QMessageBox.warning(self, "تنبيه", 
-                                  f"الكمية المطلوبة غير متوفرة. المخزون المتاح: {current_stock}")
+                                  f"الكمية المطلوبة غير متوفرة. المخزون المتاح: {e.available}")
                 return
             
-            # إضافة المنتج إلى جدول الطلب
-            row = self.order_table.rowCount()
-            self.order_table.insertRow(row)
-            
-            self.order_table.setItem(row, 0, QTableWidgetItem(str(product_id)))
-            self.order_table.setItem(row, 1, QTableWidgetItem(product_name))
-            self.order_table.setItem(row, 2, QTableWidgetItem(str(quantity)))
-            self.order_table.setItem(row, 3, QTableWidgetItem(str(selected_price)))
-            self.order_table.setItem(row, 4, QTableWidgetItem(str(selected_price * quantity)))
-            self.order_table.setItem(row, 5, QTableWidgetItem(price_type))
-            delete_button = QPushButton("حذف")
-            delete_button.setStyleSheet(self.get_delete_button_style())
-            delete_button.clicked.connect(lambda: self.remove_product_from_order(row))
-            self.order_table.setCellWidget(row, 6, delete_button)
-            
-            # تحديث المجاميع والبيانات
+            # المخزون المعروض يُحدث عبر reserved_changed؛ نفحص فقط تعديلات الآخرين
             self.update_order_totals()
-            self.refresh_data()
+            self.check_catalog_changes()
+
+    def scan_barcode(self):
+        """إضافة وحدة واحدة من المنتج الممسوح بسعر البيع دون نوافذ، ودمجها مع سطره إن وجد"""
+        barcode = self.barcode_input.text().strip()
+        self.barcode_input.clear()
+        if not barcode:
+            return
+        rows = self.search_index.lookup_barcode(barcode)
+        if not rows:
+            QApplication.beep()
+            QMessageBox.warning(self, "تنبيه", f"لا يوجد منتج بالباركود: {barcode}")
+            return
+
+        product = self.products_data[rows[0]]
+        try:
+            # وحدة واحدة تأتي دائماً من مخزن واحد
+            warehouse_id = self.allocator.allocate(product.product_id, 1)[0][0]
+        except InsufficientStock:
+            QApplication.beep()
+            QMessageBox.warning(self, "تنبيه", f"نفذ مخزون المنتج: {product.product_name}")
+            return
+        # add_line يدمج الوحدة مع السطر الموجود لنفس المنتج والمخزن والسعر
+        self.order_model.add_line(CartLine(
+            product.product_id, product.product_name, warehouse_id, 1,
+            product.retail_price or 0, 'retail', product.min_supply_price or 0))
+        self.update_order_totals()
 
     def remove_product_from_order(self, row):
         """حذف منتج من الطلب"""
-        self.order_table.removeRow(row)
+        self.order_model.remove_line(row)
         self.update_order_totals()
 
-    def update_order_totals(self):
-        """تحديث مجاميع الطلب"""
-        total = 0
-        for row in range(self.order_table.rowCount()):
-            total += float(self.order_table.item(row, 4).text())
-        
-        self.current_order['total'] = total
-        
-        # حساب الخصم إذا كان هناك عميل
-        if self.current_order['customer']:
-            self.current_order['discount'] = self.current_order['customer']['discount']
-        else:
-            self.current_order['discount'] = 0
-        
-        final_total = total - self.current_order['discount']
-        
-        # تحديث الملصقات
-        self.total_label.setText(f"الإجمالي: {total:.2f}")
-        self.discount_label.setText(f"الخصم: {self.current_order['discount']:.2f}")
-        self.final_total_label.setText(f"المجموع النهائي: {final_total:.2f}")
-
     def add_new_customer(self):
         """إضافة عميل جديد"""
         dialog = AddCustomerDialog(self.db_manager)
@@ -452,380 +568,142 @@ class SalesWindow(QWidget):
             )
             self.update_order_totals()
 
-    def save_order(self):
-        """حفظ الطلب في قاعدة البيانات"""
-        if not self.order_table.rowCount():
+    def setup_checkout_queue(self):
+        """طابور حفظ الطلبات في الخلفية وأيقونة الإشعارات الخاصة به"""
+        self.checkout_queue = get_checkout_queue(self.db_manager)
+        self.checkout_queue.committed.connect(self.on_checkout_committed)
+        self.checkout_queue.failed.connect(self.on_checkout_failed)
+        self.checkout_queue.pending_changed.connect(self.update_checkout_tray)
+        self.checkout_queue.pending_changed.connect(self.on_pending_changed)
+
+        self.checkout_tray = None
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            icon = self.style().standardIcon(QStyle.StandardPixmap.SP_DialogSaveButton)
+            self.checkout_tray = QSystemTrayIcon(icon, self)
+            # الضغط على الأيقونة يعرض الطلبات التي تعذر حفظها
+            self.checkout_tray.activated.connect(lambda reason: self.review_failed_checkouts())
+            self.checkout_tray.show()
+
+        # الطلبات المتبقية من التشغيل السابق تُحفظ في الخلفية قبل الطلبات الجديدة
+        self.checkout_queue.start()
+        self.update_checkout_tray(self.checkout_queue.pending_count())
+
+    def update_checkout_tray(self, pending):
+        if self.checkout_tray is not None:
+            self.checkout_tray.setToolTip(f"طلبات في انتظار الحفظ: {pending}")
+
+    def on_pending_changed(self, pending):
+        """تنفيذ إعادة التحميل المؤجلة بعد حفظ آخر طلب معلق"""
+        if not pending and self.reload_deferred:
+            self.load_products_data()
+
+    def on_checkout_committed(self, checkout_id, order_id):
+        """طباعة فاتورة الطلب من بياناته المحفوظة بعد حفظه إن طُلبت"""
+        self.last_order_id = order_id
+        if checkout_id in self.print_checkouts:
+            self.print_checkouts.discard(checkout_id)
+            self.print_invoice(order_id, PRIORITY_SALE)
+
+    def on_checkout_failed(self, checkout_id, error):
+        """إشعار الكاشير بطلب تعذر حفظه؛ يبقى في سجل الطلبات المعلقة للمراجعة"""
+        self.print_checkouts.discard(checkout_id)
+        message = f"تعذر حفظ الطلب {checkout_id[:8]}: {error}"
+        if self.checkout_tray is not None:
+            self.checkout_tray.showMessage("خطأ في حفظ الطلب",
+                                           message + "\nاضغط على الأيقونة لإعادة المحاولة",
+                                           QSystemTrayIcon.MessageIcon.Warning)
+        else:
+            self.review_failed_checkouts([checkout_id])
+        # إعادة الكميات التي حُجزت للطلب الفاشل إلى القائمة
+        self.search_products()
+
+    def review_failed_checkouts(self, checkout_ids=None):
+        """عرض الطلبات التي تعذر حفظها لإعادة محاولة حفظها أو تجاهلها"""
+        for checkout_id, error in self.checkout_queue.failed_checkouts():
+            if checkout_ids is not None and checkout_id not in checkout_ids:
+                continue
+            box = QMessageBox(self)
+            box.setIcon(QMessageBox.Icon.Warning)
+            box.setWindowTitle("طلب تعذر حفظه")
+            box.setText(f"تعذر حفظ الطلب {checkout_id[:8]}: {error}")
+            retry = box.addButton("إعادة المحاولة", QMessageBox.ButtonRole.AcceptRole)
+            discard = box.addButton("تجاهل الطلب", QMessageBox.ButtonRole.DestructiveRole)
+            box.addButton("لاحقاً", QMessageBox.ButtonRole.RejectRole)
+            box.exec()
+            if box.clickedButton() is retry:
+                self.checkout_queue.retry(checkout_id)
+            elif box.clickedButton() is discard:
+                self.checkout_queue.discard(checkout_id)
+            else:
+                break
+
+    def save_and_print(self):
+        """حفظ الطلب الحالي وطباعة فاتورته بعد حفظه، أو إعادة طباعة آخر طلب إذا كانت السلة فارغة"""
+        if len(self.cart):
+            self.save_order(print_invoice=True)
+        elif self.last_order_id is not None:
+            self.print_invoice(self.last_order_id)
+        else:
+            QMessageBox.warning(self, "تنبيه", "لا يوجد منتجات في الطلب")
+
+    def save_order(self, print_invoice=False):
+        """تسجيل الطلب في طابور الحفظ وبدء طلب جديد فوراً"""
+        if not len(self.cart):
             QMessageBox.warning(self, "تنبيه", "لا يوجد منتجات في الطلب")
             return
 
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("BEGIN TRANSACTION")
-
-            # إنشاء الطلب
-            cursor.execute("""
-                INSERT INTO orders (customer_id, order_date, total_price)
-                VALUES (?, DATE('now'), ?)
-            """, (
-                self.current_order['customer']['id'] if self.current_order['customer'] else None,
-                self.current_order['total']
-            ))
-            order_id = cursor.lastrowid
-
-            total_profit = 0
-            # إضافة تفاصيل الطلب وتحديث المخزون
-            for row in range(self.order_table.rowCount()):
-                product_id = int(self.order_table.item(row, 0).text())
-                quantity = int(self.order_table.item(row, 2).text())
-                price = float(self.order_table.item(row, 3).text())
-                price_type = self.order_table.item(row, 5).text()
-
-                # إضافة تفاصيل الطلب
-                cursor.execute("""
-                    INSERT INTO order_details (order_id, product_id, quantity, sale_price, price_type)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (order_id, product_id, quantity, price, price_type))
-
-                # تحديث المخزون
-                cursor.execute("""
-                    UPDATE products 
-                    SET current_stock = current_stock - ?
-                    WHERE product_id = ?
-                """, (quantity, product_id))
-
-                # تحديث المخزون في المستودع
-                warehouse_id = self.products_data[row][11]
-                cursor.execute("""
-                    UPDATE warehouse_products 
-                    SET quantity = quantity - ?
-                    WHERE warehouse_id = ? AND product_id = ?
-                """, (quantity, warehouse_id, product_id))
-
-                # حساب الربح
-                cursor.execute("""
-                    SELECT MIN(supply_price) 
-                    FROM supplier_products 
-                    WHERE product_id = ?
-                """, (product_id,))
-                supply_price = cursor.fetchone()[0] or 0
-                item_profit = (price - supply_price) * quantity
-                total_profit += item_profit
-
-                # التحقق من مستوى المخزون وإنشاء تنبيه إذا لزم الأمر
-                cursor.execute("""
-                    SELECT current_stock, min_stock_level 
-                    FROM products 
-                    WHERE product_id = ?
-                """, (product_id,))
-                current_stock, min_stock = cursor.fetchone()
-
-                if current_stock <= min_stock:
-                    cursor.execute("""
-                        SELECT alert_id FROM stock_alerts 
-                        WHERE product_id = ?
-                    """, (product_id,))
-                    existing_alert = cursor.fetchone()
-                    
-                    if existing_alert:
-                        cursor.execute("""
-                            UPDATE stock_alerts 
-                            SET current_stock = ?, 
-                                alert_status = TRUE,
-                                alert_threshold = ?
-                            WHERE product_id = ?
-                        """, (current_stock, min_stock, product_id))
-                    else:
-                        cursor.execute("""
-                            INSERT INTO stock_alerts 
-                            (product_id, current_stock, alert_threshold, alert_status)
-                            VALUES (?, ?, ?, TRUE)
-                        """, (product_id, current_stock, min_stock))
-
-                    # إنشاء إشعار
-                    cursor.execute("""
-                        INSERT INTO notifications 
-                        (notification_type, notification_content)
-                        VALUES ('تنبيه المخزون', ?)
-                    """, (f"المنتج {product_id} وصل للحد الأدنى للمخزون: {current_stock}",))
-
-            # إنشاء فاتورة
-            cursor.execute("""
-                INSERT INTO invoices (order_id, total_amount, profit, invoice_date)
-                VALUES (?, ?, ?, DATE('now'))
-            """, (
-                order_id,
-                self.current_order['total'] - self.current_order['discount'],
-                total_profit
-            ))
-
-            # تسجيل النشاط
-            cursor.execute("""
-                INSERT INTO activity_logs (user_id, action_type, action_details)
-                VALUES (?, 'طلب جديد', ?)
-            """, (1, f"تم إنشاء طلب جديد برقم {order_id}"))
-
-            conn.commit()
-            QMessageBox.information(self, "نجاح", "تم حفظ الطلب بنجاح")
-            self.cancel_order()  # إعادة تعيين نموذج الطلب
-
+            customer = self.current_order['customer']
+            # الحفظ في قاعدة البيانات يتم في الخلفية بالترتيب
+            checkout_id = self.checkout_queue.submit(customer['id'] if customer else None,
+                                                     self.cart)
         except Exception as e:
-            conn.rollback()
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء حفظ الطلب: {str(e)}")
-        finally:
-            conn.close()
+            return
+        # الفاتورة تُطبع من الطلب المحفوظ حتى تحمل رقمه ووقته الفعليين
+        if print_invoice:
+            self.print_checkouts.add(checkout_id)
+
+        # لقطة المخزون خُصم منها الطلب عند تسجيله
+        self.cancel_order()  # إعادة تعيين نموذج الطلب
+        self.search_products()
+        self.barcode_input.setFocus()
 
     def cancel_order(self):
         """إلغاء الطلب الحالي"""
-        self.order_table.setRowCount(0)
-        self.current_order = {
-            'customer': None,
-            'items': [],
-            'total': 0,
-            'discount': 0
-        }
+        self.order_model.clear()
+        self.current_order = {'customer': None}
         self.customer_info.setText("لم يتم اختيار عميل")
         self.update_order_totals()
 
-    def print_invoice(self, order_id=None):
-        """طباعة الفاتورة"""
+    def print_invoice(self, order_id, priority=PRIORITY_COUNTER):
+        """طباعة فاتورة طلب محفوظ كما حُفظت، فتطابق إعادة الطباعة الأصل؛ الرسم في عملية منفصلة"""
         try:
-            filename = f"invoice_{order_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            
-            # تسجيل الخطوط العربية
-            pdfmetrics.registerFont(TTFont('Arabic', 'fonts/arabic/NotoNaskhArabic-Regular.ttf'))
-            pdfmetrics.registerFont(TTFont('Arabic-Bold', 'fonts/arabic/NotoNaskhArabic-Bold.ttf'))
-            
-            # تحسين النص العربي
-            def arabic_text(text):
-                if not text:
-                    return ""
-                # تحسين معالجة الأرقام العربية
-                arabic_numbers = {'0': '٠', '1': '١', '2': '٢', '3': '٣', '4': '٤',
-                                '5': '٥', '6': '٦', '7': '٧', '8': '٨', '9': '٩'}
-                text = str(text)
-                for eng, ar in arabic_numbers.items():
-                    text = text.replace(eng, ar)
-                
-                # معالجة النص العربي
-                reshaped_text = arabic_reshaper.reshape(text)
-                bidi_text = get_display(reshaped_text)
-                return bidi_text
-            
-            # إنشاء ملف الفاتورة
-            doc = SimpleDocTemplate(
-                filename,
-                pagesize=A4,
-                rightMargin=20,
-                leftMargin=20,
-                topMargin=20,
-                bottomMargin=20
-            )
-            
-            elements = []
-            
-            # شعار الشركة
-            logo = Image("assets/noor_alislam.png", width=100, height=100)
-            logo_table = Table([[logo]], colWidths=[A4[0]-40])
-            logo_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            elements.append(logo_table)
-            elements.append(Spacer(1, 20))
-            
-            # ترويسة الفاتورة
-            header_data = [
-                [arabic_text('رقم الفاتورة: ' + str(order_id)), arabic_text('فاتورة ضريبية مبسطة')],
-                [arabic_text(f'التاريخ: {datetime.now().strftime("%Y-%m-%d")}'), arabic_text('نور الإسلام')],
-                [arabic_text(f'الوقت: {datetime.now().strftime("%H:%M:%S")}'), arabic_text('الرقم الضريبي: ١٢٣٤٥٦٧٨٩')]
-            ]
-            header_table = Table(header_data, colWidths=[(A4[0]-40)/2]*2)
-            header_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-                ('FONT', (0, 0), (-1, -1), 'Arabic-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 14),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('BACKGROUND', (0, 0), (-1, -1), colors.Color(0.95, 0.95, 0.95)),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-                ('LEFTPADDING', (0, 0), (-1, -1), 10),
-            ]))
-            elements.append(header_table)
-            elements.append(Spacer(1, 20))
-            
-            # معلومات العميل
-            if self.current_order['customer']:
-                customer_data = [
-                    [arabic_text('بيانات العميل')],
-                    [arabic_text(f"الاسم: {self.current_order['customer']['name']}")],
-                    [arabic_text(f"العنوان: {self.current_order['customer'].get('address', '')}")],
-                    [arabic_text(f"رقم الهاتف: {self.current_order['customer'].get('phone', '')}")],
-                ]
-            else:
-                customer_data = [[arabic_text('عميل نقدي')]]
-            
-            customer_table = Table(customer_data, colWidths=[A4[0]-40])
-            customer_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-                ('FONT', (0, 0), (0, 0), 'Arabic-Bold'),
-                ('FONT', (0, 1), (-1, -1), 'Arabic'),
-                ('FONTSIZE', (0, 0), (0, 0), 14),
-                ('FONTSIZE', (0, 1), (-1, -1), 12),
-                ('BACKGROUND', (0, 0), (0, 0), colors.Color(0.9, 0.9, 0.9)),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 15),
-            ]))
-            elements.append(customer_table)
-            elements.append(Spacer(1, 20))
-            
-            # جدول المنتجات
-            products_data = [[
-                arabic_text('الإجمالي'),
-                arabic_text('السعر'),
-                arabic_text('الكمية'),
-                arabic_text('الصنف'),
-                arabic_text('م')
-            ]]
-            
-            for row in range(self.order_table.rowCount()):
-                products_data.append([
-                    f"{float(self.order_table.item(row, 4).text()):.2f}",
-                    f"{float(self.order_table.item(row, 3).text()):.2f}",
-                    self.order_table.item(row, 2).text(),
-                    arabic_text(self.order_table.item(row, 1).text()),
-                    str(row + 1)
-                ])
-            
-            # إضافة صف المجموع
-            products_data.append([
-                f"{self.current_order['total']:.2f}",
-                "",
-                "",
-                arabic_text("الإجمالي"),
-                ""
-            ])
-            
-            # إضافة صف الخصم إذا وجد
-            if self.current_order['discount'] > 0:
-                products_data.append([
-                    f"{self.current_order['discount']:.2f}",
-                    "",
-                    "",
-                    arabic_text("الخصم"),
-                    ""
-                ])
-            
-            # إضافة صف المجموع الفرعي
-            subtotal = self.current_order['total'] - self.current_order['discount']
-            products_data.append([
-                f"{subtotal:.2f}",
-                "",
-                "",
-                arabic_text("الصافي"),
-                ""
-            ])
-            
-            # إضافة ضريبة القيمة المضافة إذا كانت مفعلة
-            if self.vat_checkbox.isChecked():
-                vat_rate = self.vat_rate.value() / 100
-                vat_amount = subtotal * vat_rate
-                products_data.append([
-                    f"{vat_amount:.2f}",
-                    "",
-                    "",
-                    arabic_text(f"ضريبة القيمة المضافة {self.vat_rate.value()}%"),
-                    ""
-                ])
-                
-                # المجموع النهائي مع الضريبة
-                final_total = subtotal + vat_amount
-                products_data.append([
-                    f"{final_total:.2f}",
-                    "",
-                    "",
-                    arabic_text("الإجمالي شامل الضريبة"),
-                    ""
-                ])
-            
-            col_widths = [70, 70, 60, A4[0]-260, 30]
-            products_table = Table(products_data, colWidths=col_widths, repeatRows=1)
-            products_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-2, -1), 'CENTER'),
-                ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
-                ('FONT', (0, 0), (-1, 0), 'Arabic-Bold'),
-                ('FONT', (0, 1), (-1, -1), 'Arabic'),
-                ('FONTSIZE', (0, 0), (-1, -1), 12),
-                ('GRID', (0, 0), (-1, -2), 0.5, colors.grey),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ]))
-            elements.append(products_table)
-            elements.append(Spacer(1, 20))
-            
-            # إضافة QR code
-            qr_table = self.get_qr_code()
-            if qr_table:
-                elements.append(qr_table)
-            
-            # إضافة التذييل
-            footer_text = arabic_text("شكراً لتعاملكم معنا - نور الإسلام")
-            footer = Paragraph(footer_text, ParagraphStyle(
-                'footer',
-                fontName='Arabic',
-                fontSize=12,
-                alignment=2,  # محاذاة لليمين
-                textColor=colors.black
-            ))
-            elements.append(Spacer(1, 20))
-            elements.append(footer)
-            
-            # إنشاء الفاتورة
-            doc.build(elements)
-            
-            # فتح الفاتورة
-            os.startfile(filename)
-            
+            saved = self.db_manager.get_saved_invoice(order_id)
+            if saved is None:
+                QMessageBox.warning(self, "تنبيه", f"لا توجد فاتورة محفوظة للطلب {order_id}")
+                return
+            invoice = InvoiceSnapshot.from_saved(saved)
+            job_id = self.invoice_service.submit(invoice, priority=priority)
+            self.invoice_jobs.add(job_id)
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء طباعة الفاتورة: {str(e)}")
 
-    def get_qr_code(self):
-        """إنشاء QR code للفاتورة"""
+    def on_invoice_rendered(self, job_id, filename):
+        """فتح الفاتورة بعد انتهاء رسمها"""
+        if job_id not in self.invoice_jobs:
+            return
+        self.invoice_jobs.discard(job_id)
         try:
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr_data = {
-                'seller_name': 'نور الإسلام',
-                'tax_number': '123456789',
-                'invoice_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'total_amount': self.current_order['total'] - self.current_order['discount'],
-                'tax_amount': (self.current_order['total'] - self.current_order['discount']) * 0.14
-            }
-            qr.add_data(json.dumps(qr_data, ensure_ascii=False))
-            qr.make(fit=True)
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            # حفظ QR code مؤقتاً
-            temp_qr_path = "temp_qr.png"
-            qr_img.save(temp_qr_path)
-            
-            # إنشاء جدول يحتوي على QR code
-            qr_table = Table([[Image(temp_qr_path, width=100, height=100)]], 
-                            colWidths=[100], rowHeights=[100])
-            qr_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            
-            return qr_table
+            os.startfile(filename)
         except Exception as e:
-            print(f"Error generating QR code: {e}")
-            return None
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء فتح الفاتورة: {str(e)}")
+
+    def on_invoice_failed(self, job_id, error):
+        if job_id not in self.invoice_jobs:
+            return
+        self.invoice_jobs.discard(job_id)
+        QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء طباعة الفاتورة: {error}")
 
     def refresh_data(self):
         """تحديث جميع البيانات في الواجهة"""
@@ -837,29 +715,7 @@ class SalesWindow(QWidget):
     def on_vat_changed(self, state):
         """معالجة تغيير حالة ضريبة القيمة المضافة"""
         self.vat_rate.setEnabled(state == 2)  # 2 means checked
-        self.update_totals()
-
-    def update_totals(self):
-        """تحديث المجاميع والضريبة"""
-        total = 0
-        for row in range(self.order_table.rowCount()):
-            total += float(self.order_table.item(row, 4).text())
-        
-        # تطبيق الخصم
-        discount = float(self.discount_input.text()) if self.discount_input.text() else 0
-        subtotal = total - discount
-        
-        # حساب ضريبة القيمة المضافة
-        vat_amount = 0
-        if self.vat_checkbox.isChecked():
-            vat_rate = self.vat_rate.value() / 100
-            vat_amount = subtotal * vat_rate
-        
-        # تحديث المجاميع
-        final_total = subtotal + vat_amount
-        
-        self.total_label.setText(f"{total:.2f}")
-        self.final_total_label.setText(f"{final_total:.2f}")
+        self.update_order_totals()
 
     def clear_order(self):
         """مسح الطلب الحالي"""
@@ -874,61 +730,32 @@ class SalesWindow(QWidget):
             
             if reply == QMessageBox.StandardButton.Yes:
                 # مسح جدول الطلب
-                self.order_table.setRowCount(0)
+                self.order_model.clear()
                 
                 # إعادة تعيين المجاميع
                 self.discount_input.clear()
                 self.vat_checkbox.setChecked(False)
                 self.vat_rate.setValue(14)
                 
-                # تحديث المجاميع
-                self.update_totals()
-                
                 # إعادة تعيين بيانات الطلب
-                self.current_order = {
-                    'customer': None,
-                    'items': [],
-                    'total': 0,
-                    'discount': 0,
-                    'vat': 0,
-                    'final_total': 0
-                }
+                self.current_order = {'customer': None}
+                
+                # تحديث المجاميع
+                self.update_order_totals()
                 
                 QMessageBox.information(self, "تم", "تم مسح الطلب بنجاح")
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء مسح الطلب: {str(e)}")
 
     def update_order_totals(self):
-        """تحديث مجاميع الطلب"""
+        """تحديث الخصم والضريبة في السلة وعرض مجاميعها"""
         try:
-            total = 0
-            for row in range(self.order_table.rowCount()):
-                total += float(self.order_table.item(row, 4).text())
-            
-            # تحديث إجمالي الطلب
-            self.current_order['total'] = total
-            
-            # تحديث الخصم
             discount = float(self.discount_input.text()) if self.discount_input.text() else 0
-            self.current_order['discount'] = discount
-            
-            # حساب الصافي
-            subtotal = total - discount
+            self.cart.set_discount(discount)
+            self.cart.set_vat(self.vat_checkbox.isChecked(), self.vat_rate.value() / 100)
             
-            # حساب ضريبة القيمة المضافة
-            vat_amount = 0
-            if self.vat_checkbox.isChecked():
-                vat_rate = self.vat_rate.value() / 100
-                vat_amount = subtotal * vat_rate
-            self.current_order['vat'] = vat_amount
-            
-            # حساب الإجمالي النهائي
-            final_total = subtotal + vat_amount
-            self.current_order['final_total'] = final_total
-            
-            # تحديث الواجهة
-            self.total_label.setText(f"{total:.2f}")
-            self.final_total_label.setText(f"{final_total:.2f}")
+            self.total_label.setText(f"{self.cart.subtotal:.2f}")
+            self.final_total_label.setText(f"{self.cart.total:.2f}")
             
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تحديث المجاميع: {str(e)}")
@@ -1171,6 +998,9 @@ class CustomerManagementDialog(QDialog):
     def __init__(self, db_manager, parent=None):
         super().__init__(parent)
         self.db_manager = db_manager
+        self.customers = []
+        self.next_cursor = None
+        self.page_loading = False
         self.setWindowTitle("إدارة العملاء")
         self.setFixedSize(800, 600)
         self.setLayoutDirection(Qt.LayoutDirection.RightToLeft)
@@ -1180,6 +1010,12 @@ class CustomerManagementDialog(QDialog):
     def setup_ui(self):
         layout = QVBoxLayout(self)
         
+        # Customer Search
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("بحث بالاسم أو رقم الهاتف...")
+        self.search_input.textChanged.connect(self.load_customers)
+        layout.addWidget(self.search_input)
+        
         # Customers Table
         self.customers_table = QTableWidget()
         self.customers_table.setColumnCount(5)
@@ -1199,6 +1035,7 @@ class CustomerManagementDialog(QDialog):
                 border: 1px solid #c5a572;
             }
         """)
+        self.customers_table.verticalScrollBar().valueChanged.connect(self.on_table_scrolled)
         layout.addWidget(self.customers_table)
         
         # Buttons
@@ -1220,13 +1057,46 @@ class CustomerManagementDialog(QDialog):
         layout.addLayout(buttons_layout)
 
     def load_customers(self):
-        customers = self.db_manager.get_customers()
-        self.customers_table.setRowCount(len(customers))
-        for row, customer in enumerate(customers):
+        """تحميل الصفحة الأولى من العملاء حسب نص البحث"""
+        self.load_customers_page(None)
+
+    def load_customers_page(self, after):
+        self.page_loading = True
+        get_executor().submit(
+            self.db_manager.get_customers_page,
+            filter_text=self.search_input.text(),
+            after=after,
+            limit=CUSTOMERS_PAGE_SIZE,
+            key='customers.list',
+            on_result=lambda page: self.on_customers_page_loaded(page, after is None),
+            on_error=self.on_load_error
+        )
+
+    def on_customers_page_loaded(self, page, first_page):
+        self.page_loading = False
+        if first_page:
+            self.customers = []
+            self.customers_table.setRowCount(0)
+        self.next_cursor = page.next_cursor
+
+        start = len(self.customers)
+        self.customers.extend(page.rows)
+        self.customers_table.setRowCount(len(self.customers))
+        for row, customer in enumerate(page.rows, start):
             for col, value in enumerate(customer):
                 item = QTableWidgetItem(str(value))
                 self.customers_table.setItem(row, col, item)
-        self.customers_table.resizeColumnsToContents()
+        if first_page:
+            self.customers_table.resizeColumnsToContents()
+
+    def on_table_scrolled(self, value):
+        scroll_bar = self.customers_table.verticalScrollBar()
+        if self.next_cursor and not self.page_loading and value >= scroll_bar.maximum() - 5:
+            self.load_customers_page(self.next_cursor)
+
+    def on_load_error(self, error):
+        self.page_loading = False
+        QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تحميل العملاء: {str(error)}")
 
     def add_customer(self):
         dialog = AddEditCustomerDialog(self.db_manager)
@@ -1239,7 +1109,7 @@ class CustomerManagementDialog(QDialog):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار عميل للتعديل")
             return
         
-        customer_id = int(self.customers_table.item(current_row, 0).text())
+        customer_id = self.customers[current_row].customer_id
         customer = self.db_manager.get_customer_details(customer_id)
         
         dialog = AddEditCustomerDialog(self.db_manager, customer)
@@ -1252,7 +1122,7 @@ class CustomerManagementDialog(QDialog):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار عميل للحذف")
             return
         
-        customer_id = int(self.customers_table.item(current_row, 0).text())
+        customer_id = self.customers[current_row].customer_id
         reply = QMessageBox.question(
             self, "تأكيد الحذف",
             "هل أنت متأكد من حذف هذا العميل؟",
@@ -1272,7 +1142,7 @@ class CustomerManagementDialog(QDialog):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار عميل")
             return
         
-        self.selected_customer_id = int(self.customers_table.item(current_row, 0).text())
+        self.selected_customer_id = self.customers[current_row].customer_id
         self.accept()
 
     def get_button_style(self):
@@ -3,6 +3,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
                                QDialog, QMessageBox, QComboBox, QDoubleSpinBox, QDateEdit)
 from PyQt6.QtCore import Qt, QDate
 from database_manager import DatabaseManager
+from db_worker import get_executor
 import datetime
 
 class AddEditSupplierDialog(QDialog):
@@ -123,7 +124,9 @@ class AddSupplierProductDialog(QDialog):
 class SuppliersWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.db_manager = DatabaseManager()
+        # شاشة إدارية تقرأ الكتالوج كاملاً؛ اتصالاتها منفصلة عن اتصالات شاشة البيع
+        self.db_manager = DatabaseManager(profile='reporting')
+        self.suppliers = []
         self.setup_ui()
         self.load_suppliers()
 
@@ -206,7 +209,17 @@ class SuppliersWidget(QWidget):
             """)
 
     def load_suppliers(self):
-        suppliers = self.db_manager.get_suppliers()
+        get_executor().submit(
+            self.db_manager.get_suppliers,
+            as_records=True,
+            key='suppliers.list',
+            on_result=self.on_suppliers_loaded,
+            on_error=lambda e: QMessageBox.critical(
+                self, "خطأ", f"حدث خطأ أثناء تحميل الموردين: {str(e)}")
+        )
+
+    def on_suppliers_loaded(self, suppliers):
+        self.suppliers = suppliers
         self.table.setRowCount(len(suppliers))
         for row, supplier in enumerate(suppliers):
             for col, value in enumerate(supplier):
@@ -232,12 +245,9 @@ class SuppliersWidget(QWidget):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار مورد للتعديل")
             return
 
-        supplier_id = int(self.table.item(current_row, 0).text())
-        supplier_data = [
-            supplier_id,
-            self.table.item(current_row, 1).text(),
-            self.table.item(current_row, 2).text()
-        ]
+        supplier = self.suppliers[current_row]
+        supplier_id = supplier.supplier_id
+        supplier_data = [supplier_id, supplier.supplier_name, supplier.contact_details or ""]
 
         dialog = AddEditSupplierDialog(self, supplier_data)
         if dialog.exec() == QDialog.DialogCode.Accepted:
@@ -254,7 +264,7 @@ class SuppliersWidget(QWidget):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار مورد للحذف")
             return
 
-        supplier_id = int(self.table.item(current_row, 0).text())
+        supplier_id = self.suppliers[current_row].supplier_id
         reply = QMessageBox.question(self, "تأكيد الحذف",
                                    "هل أنت متأكد من حذف هذا المورد؟",
                                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
@@ -272,7 +282,7 @@ class SuppliersWidget(QWidget):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار مورد لإضافة منتج له")
             return
 
-        supplier_id = int(self.table.item(current_row, 0).text())
+        supplier_id = self.suppliers[current_row].supplier_id
         dialog = AddSupplierProductDialog(self, self.db_manager)
         
         if dialog.exec() == QDialog.DialogCode.Accepted:
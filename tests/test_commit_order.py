@@ -0,0 +1,120 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import query_instrumentation
+from cart import CartLine
+from connection_pool import close_all_pools
+from database_manager import DatabaseManager
+from inventory import InsufficientStock
+
+# BEGIN IMMEDIATE, the order, three executemany batches, profit, two alert
+# statements, notifications, the invoice and the activity log; COMMIT goes
+# through the connection and is not counted
+COMMIT_ORDER_STATEMENTS = 11
+
+
+class CommitOrderTestCase(unittest.TestCase):
+    """A fresh database holding 50 products with 1000 of each in warehouse 1"""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._dir = tempfile.TemporaryDirectory()
+        # database.create_connection() opens noor_alislam.db in the working directory
+        os.chdir(self._dir.name)
+        database.initialize_database()
+        self.db_manager = DatabaseManager(os.path.join(self._dir.name, 'noor_alislam.db'))
+        conn = self.db_manager.get_connection()
+        conn.execute("INSERT INTO warehouses (warehouse_id, warehouse_name) VALUES (1, 'main')")
+        conn.executemany("""
+            INSERT INTO products (product_id, product_name, min_stock_level, current_stock)
+            VALUES (?, ?, 5, 1000)
+        """, [(product_id, f"product {product_id}") for product_id in range(1, 51)])
+        conn.executemany("""
+            INSERT INTO warehouse_products (warehouse_id, product_id, quantity) VALUES (1, ?, 1000)
+        """, [(product_id,) for product_id in range(1, 51)])
+        conn.commit()
+        self.statements = []
+
+    def tearDown(self):
+        query_instrumentation.remove_hook(self.statements.append)
+        close_all_pools()
+        os.chdir(self._cwd)
+        self._dir.cleanup()
+
+    def commit(self, line_count: int) -> int:
+        """Sell 2 of each of the first line_count products; returns the order_id"""
+        lines = [CartLine(product_id, f"product {product_id}", 1, 2, 10.0, 'retail')
+                 for product_id in range(1, line_count + 1)]
+        subtotal = sum(line.total for line in lines)
+        return self.db_manager.commit_order(None, lines, subtotal, subtotal,
+                                            update_inventory=False)
+
+    def query(self, sql: str, *params):
+        return self.db_manager.get_connection().execute(sql, params).fetchall()
+
+    def stock(self):
+        """(product_id, warehouse quantity, products.current_stock) of every product"""
+        return self.query("""
+            SELECT p.product_id, wp.quantity, p.current_stock
+            FROM products p JOIN warehouse_products wp ON wp.product_id = p.product_id
+            ORDER BY p.product_id
+        """)
+
+
+class CommitOrderStatementsTest(CommitOrderTestCase):
+    """commit_order runs a fixed number of statements whatever the number of lines"""
+
+    def count_statements(self, line_count: int) -> int:
+        self.statements.clear()
+        query_instrumentation.add_hook(self.statements.append)
+        try:
+            self.commit(line_count)
+        finally:
+            query_instrumentation.remove_hook(self.statements.append)
+        return len(self.statements)
+
+    def test_statement_count_is_fixed(self):
+        for line_count in (1, 5, 50):
+            with self.subTest(lines=line_count):
+                self.assertEqual(self.count_statements(line_count), COMMIT_ORDER_STATEMENTS)
+
+
+class CommitOrderRowsTest(CommitOrderTestCase):
+    """commit_order writes the sale and its stock movements, or nothing at all"""
+
+    def test_sale_is_written(self):
+        order_id = self.commit(5)
+        self.assertEqual(
+            self.query("""
+                SELECT product_id, quantity, sale_price, price_type FROM order_details
+                WHERE order_id = ? ORDER BY product_id
+            """, order_id),
+            [(product_id, 2, 10.0, 'retail') for product_id in range(1, 6)])
+        self.assertEqual(self.stock(),
+                         [(product_id, 998, 998) for product_id in range(1, 6)]
+                         + [(product_id, 1000, 1000) for product_id in range(6, 51)])
+        self.assertEqual(self.query("SELECT total_amount FROM invoices WHERE order_id = ?",
+                                    order_id), [(100,)])
+
+    def test_short_stock_rolls_back(self):
+        conn = self.db_manager.get_connection()
+        conn.execute("UPDATE warehouse_products SET quantity = 1 WHERE product_id = 3")
+        conn.commit()
+        before = self.stock()
+        with self.assertRaises(InsufficientStock) as raised:
+            self.commit(5)
+        self.assertEqual((raised.exception.product_id, raised.exception.warehouse_id), (3, 1))
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(self.stock(), before)
+        for table in ('orders', 'order_details', 'invoices'):
+            with self.subTest(table=table):
+                self.assertEqual(self.query(f"SELECT COUNT(*) FROM {table}"), [(0,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtWidgets import QApplication
+
+import database
+from cart import CartLine
+from connection_pool import close_all_pools
+
+
+class LogoutReservationsTest(unittest.TestCase):
+    """Logging out with items in the cart gives their stock back to the shared snapshot"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._dir = tempfile.TemporaryDirectory()
+        # The windows open noor_alislam.db in the working directory
+        os.chdir(self._dir.name)
+        database.initialize_database()
+        conn = database.create_connection()
+        conn.execute("INSERT INTO warehouses (warehouse_id, warehouse_name) VALUES (1, 'main')")
+        conn.execute("""
+            INSERT INTO products (product_id, product_name, min_stock_level, current_stock)
+            VALUES (1, 'product 1', 5, 10)
+        """)
+        conn.execute(
+            "INSERT INTO warehouse_products (warehouse_id, product_id, quantity) VALUES (1, 1, 10)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        close_all_pools()
+        os.chdir(self._cwd)
+        self._dir.cleanup()
+
+    def test_relogin_sees_released_stock(self):
+        import main
+        dashboard = main.Dashboard()
+        inventory = dashboard.sales_page.inventory
+        inventory.ensure_loaded()
+        dashboard.sales_page.order_model.add_line(
+            CartLine(1, 'product 1', 1, 4, 10.0, 'retail'))
+        self.assertEqual(inventory.available(1, 1), 6)
+
+        # Logging out closes the dashboard, which is not deleted
+        dashboard.close()
+        dashboard = main.Dashboard()
+        try:
+            self.assertIs(dashboard.sales_page.inventory, inventory)
+            dashboard.sales_page.inventory.load()
+            self.assertEqual(inventory.available(1, 1), 10)
+        finally:
+            dashboard.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+
+from typography import string_width
+
+# Shaped strings kept per process; invoice labels and product names repeat a lot
+SHAPE_CACHE_SIZE = 4096
+
+# Digit styles: 'latin' leaves 0-9 alone, 'arabic' prints them as ٠-٩
+_DIGIT_TABLES: Dict[str, dict] = {
+    'latin': {},
+    'arabic': str.maketrans('0123456789', '٠١٢٣٤٥٦٧٨٩'),
+}
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _shape(text: str, digits: str) -> str:
+    # Join the letter forms, then reorder into visual order for the PDF canvas
+    return get_display(arabic_reshaper.reshape(text.translate(_DIGIT_TABLES[digits])))
+
+
+def shape(text, digits: str = 'arabic') -> str:
+    """Arabic text ready to draw left-to-right on a ReportLab canvas"""
+    if not text:
+        return ""
+    if digits not in _DIGIT_TABLES:
+        raise ValueError(f"Unknown digit style: {digits}")
+    return _shape(str(text), digits)
+
+
+def shape_many(texts: Iterable, digits: str = 'arabic') -> List[str]:
+    """shape() over a batch, e.g. a table row; repeated strings are shaped once"""
+    return [shape(text, digits) for text in texts]
+
+
+def shape_wrapped(text, font: str, size: float, width: float,
+                  digits: str = 'arabic') -> List[str]:
+    """Shaped lines of text no wider than width, broken between words.
+
+    Lines are broken in logical order and each is shaped on its own, so the
+    first words read on the first line. A single word wider than width
+    gets a line to itself.
+    """
+    lines: List[str] = []
+    current = ''
+    for word in str(text or '').split():
+        candidate = f"{current} {word}" if current else word
+        if current and string_width(shape(candidate, digits), font, size) > width:
+            lines.append(current)
+            candidate = word
+        current = candidate
+    if current:
+        lines.append(current)
+    return shape_many(lines, digits)
+
+
+def cache_info():
+    return _shape.cache_info()
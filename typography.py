@@ -0,0 +1,96 @@
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# Fonts bundled with the application, named <Family-Words>-<Style>.ttf
+FONTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'fonts')
+STYLES = ('Regular', 'Bold', 'Italic', 'BoldItalic', 'Light', 'Medium', 'ExtraBold', 'Black')
+# Styles to try, in order, when a family lacks the one asked for
+_FALLBACKS = {
+    'Bold': ('ExtraBold', 'Black', 'Medium'),
+    'ExtraBold': ('Black', 'Bold'),
+    'Black': ('ExtraBold', 'Bold'),
+    'Medium': ('Regular',),
+    'Light': ('Regular',),
+    'Italic': ('Regular',),
+    'BoldItalic': ('Bold', 'Italic'),
+}
+
+_lock = threading.Lock()
+_families: Optional[Dict[str, Dict[str, str]]] = None
+_registered: Dict[str, str] = {}
+
+
+def _scan() -> Dict[str, Dict[str, str]]:
+    """family -> {style: path} for every bundled font file"""
+    families: Dict[str, Dict[str, str]] = {}
+    if not os.path.isdir(FONTS_DIR):
+        return families
+    for filename in sorted(os.listdir(FONTS_DIR)):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() != '.ttf' or '-' not in stem:
+            continue
+        family, style = stem.rsplit('-', 1)
+        if style not in STYLES:
+            continue
+        families.setdefault(family.replace('-', ' '), {})[style] = os.path.join(FONTS_DIR, filename)
+    return families
+
+
+def families() -> Dict[str, Dict[str, str]]:
+    global _families
+    if _families is None:
+        with _lock:
+            if _families is None:
+                _families = _scan()
+    return _families
+
+
+def font_name(family: str, style: str = 'Regular') -> str:
+    """ReportLab name of family's style, registering the font on first use.
+
+    A missing style falls back to a close one and finally to Regular.
+    Raises KeyError for a family that is not bundled.
+    """
+    key = f"{family}/{style}"
+    name = _registered.get(key)
+    if name is not None:
+        return name
+    styles = families()[family]
+    for candidate in (style, *_FALLBACKS.get(style, ()), 'Regular'):
+        if candidate in styles:
+            break
+    else:
+        candidate = next(iter(styles))
+    name = f"{family.replace(' ', '')}-{candidate}"
+    with _lock:
+        if name not in pdfmetrics.getRegisteredFontNames():
+            # Parsing the TTF is the expensive part; it happens once per process
+            pdfmetrics.registerFont(TTFont(name, styles[candidate]))
+        _registered[key] = name
+    return name
+
+
+def register_family(family: str) -> str:
+    """Register family's regular, bold and italic faces so <b>/<i> work in Paragraphs"""
+    normal = font_name(family)
+    pdfmetrics.registerFontFamily(
+        normal, normal=normal, bold=font_name(family, 'Bold'),
+        italic=font_name(family, 'Italic'), boldItalic=font_name(family, 'BoldItalic'))
+    return normal
+
+
+def warm_up(family_names: Iterable[str] = ()):
+    """Register fonts ahead of the first document, e.g. in a worker process initializer"""
+    for family in family_names:
+        register_family(family)
+
+
+@lru_cache(maxsize=4096)
+def string_width(text: str, font: str, size: float) -> float:
+    """Cached pdfmetrics.stringWidth; invoice text repeats heavily between documents"""
+    return pdfmetrics.stringWidth(text, font, size)
@@ -1,16 +1,11 @@
-import sqlite3
 import bcrypt
 from sqlite3 import Error
+import database
 
 def create_connection():
-    """Create a database connection to SQLite database"""
-    conn = None
-    try:
-        conn = sqlite3.connect('noor_alislam.db')
-        return conn
-    except Error as e:
-        print(e)
-    return conn
+    """Create a database connection to SQLite database with the cashier pragma profile"""
+    # WAL and busy_timeout let user writes wait for an active sale instead of failing
+    return database.create_connection('cashier')
 
 def add_user(username, password, user_type):
     """Add a new user to the database"""